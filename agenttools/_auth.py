@@ -0,0 +1,18 @@
+"""GitHub token lookup shared by the GitHub API modules."""
+
+from __future__ import annotations
+
+import os
+from typing import Optional
+
+
+def resolve_token(token: Optional[str], required: bool = True) -> Optional[str]:
+    """Return `token`, falling back to the GITHUB_TOKEN environment variable.
+
+    The environment is read at call time rather than cached at import, so a
+    token exported after the module was loaded is still picked up.
+    """
+    token = token or os.getenv("GITHUB_TOKEN")
+    if not token and required:
+        raise ValueError("GITHUB_TOKEN must be set in environment or passed as token")
+    return token
@@ -0,0 +1,30 @@
+"""JSON helpers shared by the GitHub API modules.
+
+Uses `orjson` when it is installed and falls back to the stdlib `json`
+module otherwise. Both helpers work with bytes so the output can be sent
+as a request body without re-encoding.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional speedup; fall back to the stdlib
+    orjson = None
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize `obj` to JSON bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
+
+
+def loads(data: bytes) -> Any:
+    """Parse JSON bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -2,81 +2,209 @@
 
 import os
 import argparse
-import json
+import asyncio
+import atexit
 import re
-from typing import Optional
+import sys
 from dotenv import load_dotenv
-from langchain.agents import create_agent
-from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_ollama import ChatOllama
 
-from agenttools.tools import get_file_tools
+from agenttools.cache import ResponseCache, SemanticCache
 from agenttools.formatters import normalize_content
 from agenttools.system_prompt import load_system_prompt
 import agenttools.tracing as tracing
 
+# Error text produced by httpx/ollama when the Ollama server is unreachable
+_OLLAMA_CONN_ERR = re.compile(r"Connection refused|ConnectError|\[Errno 111\]")
+
+_DOTENV_LOADED = False
+
+
+def _load_dotenv_once() -> None:
+    """Load the .env file on first use only; later agents reuse os.environ."""
+    global _DOTENV_LOADED
+    if not _DOTENV_LOADED:
+        load_dotenv()
+        _DOTENV_LOADED = True
+
+
+def _agent_input(query: str) -> dict:
+    """Build the agent graph input for a single user query.
+
+    The message is passed as a plain role/content dict; the agent graph
+    converts it to a HumanMessage itself, so no Pydantic model is built and
+    validated here for every query.
+    """
+    return {"messages": [{"role": "user", "content": query}]}
+
+
 class FileAgent:
     """An AI agent with file access capabilities supporting Gemini and Ollama providers."""
 
-    def __init__(self, provider: str = None, model: str = None, response_file: str | None = None):
+    def __init__(
+        self,
+        provider: str = None,
+        model: str = None,
+        response_file: str | None = None,
+        max_concurrency: int | None = None,
+        temperature: float = 0.1,
+        cache: bool = True,
+        cache_ttl: float | None = None,
+        semantic_cache: bool = False,
+        semantic_threshold: float = 0.92,
+        warmup: bool = False,
+    ):
         """Initialize the FileAgent.
 
         Args:
             provider: LLM provider to use ('gemini' or 'ollama')
             model: Specific model name to use (optional, uses defaults from .env)
+            response_file: Optional path to a file where responses are appended
+            max_concurrency: Upper bound on in-flight requests for `run_batch`.
+                For Ollama this defaults to OLLAMA_NUM_PARALLEL (the number of
+                requests the server processes in parallel); unbounded otherwise.
+            temperature: Sampling temperature passed to the LLM
+            cache: Reuse previous responses for identical queries. Only takes
+                effect with temperature 0, since sampled answers are not
+                reproducible. Entries live in AGENT_CACHE_DIR (default
+                '.agent_cache').
+            cache_ttl: Optional maximum age of cached responses in seconds
+            semantic_cache: Also reuse responses of earlier queries in this
+                session whose embedding is similar to the new query. Uses
+                OLLAMA_EMBED_MODEL (default 'all-minilm') or GEMINI_EMBED_MODEL
+                (default 'models/text-embedding-004').
+            semantic_threshold: Minimum cosine similarity for a semantic hit
+            warmup: Load the Ollama model into memory during initialization so
+                the first query does not pay the model load time. How long the
+                model then stays loaded is set by OLLAMA_KEEP_ALIVE (e.g. '30m').
         """
+        # Provider SDKs and the agent runtime are imported lazily: they dominate
+        # import time, and only one provider is needed per agent.
+        from langchain.agents import create_agent
+        from agenttools.tools import get_file_tools
+
         # This will load environment variables from a .env file if present
-        load_dotenv()
+        _load_dotenv_once()
 
         self.provider = provider.lower()
-        self.tools = get_file_tools()
+        # Providers reuse cached KV state only for byte-identical request
+        # prefixes, so tool schemas are emitted in a fixed (sorted) order.
+        self.tools = sorted(get_file_tools(), key=lambda t: t.name)
         # File where AI responses are appended
         self.response_file = response_file
+        self.max_concurrency = max_concurrency
+        self.temperature = temperature
 
         # Initialize the appropriate LLM
         if self.provider == "gemini":
+            from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+
             api_key = os.getenv("GOOGLE_API_KEY")
             if not api_key:
                 raise ValueError("GOOGLE_API_KEY not found in environment variables")
 
-            model_name = model or os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+            self.model_name = model or os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
 
             self.llm = ChatGoogleGenerativeAI(
-                model=model_name,
+                model=self.model_name,
                 google_api_key=api_key,
-                temperature=0.1,
+                temperature=self.temperature,
                 top_p=0.8,
                 top_k=50,
                 max_tokens=4096
             )
+            if semantic_cache:
+                embeddings = GoogleGenerativeAIEmbeddings(
+                    model=os.getenv("GEMINI_EMBED_MODEL", "models/text-embedding-004"),
+                    google_api_key=api_key,
+                )
         elif self.provider == "ollama":
+            from langchain_ollama import ChatOllama, OllamaEmbeddings
+
             base_url = os.getenv("OLLAMA_BASE_URL", "http://10.0.2.2:11434")
             # keep for error messages
             self.base_url = base_url
-            model_name = model or os.getenv("OLLAMA_MODEL", "granite4:micro-h")
+            self.model_name = model or os.getenv("OLLAMA_MODEL", "granite4:micro-h")
+            # Duration string ('30m') or seconds; negative keeps the model loaded
+            keep_alive = os.getenv("OLLAMA_KEEP_ALIVE") or None
+            if keep_alive and keep_alive.lstrip("-").isdigit():
+                keep_alive = int(keep_alive)
+            self.keep_alive = keep_alive
             self.llm = ChatOllama(
-                model=model_name,
+                model=self.model_name,
                 base_url=base_url,
-                temperature=0.1,
+                temperature=self.temperature,
                 top_p=0.8,
                 top_k=50,
-                max_tokens=8192
+                max_tokens=8192,
+                keep_alive=self.keep_alive,
             )
+            if warmup:
+                self.warmup()
+            if semantic_cache:
+                embeddings = OllamaEmbeddings(
+                    model=os.getenv("OLLAMA_EMBED_MODEL", "all-minilm"),
+                    base_url=base_url,
+                )
+            # Sending more concurrent requests than the server runs in parallel
+            # only queues them server-side, so match its OLLAMA_NUM_PARALLEL.
+            num_parallel = os.getenv("OLLAMA_NUM_PARALLEL")
+            if self.max_concurrency is None and num_parallel:
+                self.max_concurrency = int(num_parallel)
         else:
             raise ValueError(f"Unsupported provider: {provider}. Use 'gemini' or 'ollama'")
 
         env_path = os.getenv("SYSTEM_PROMPT_FILE")
         if env_path:
-            system_prompt = load_system_prompt()
+            # Keep the prompt free of per-run values (timestamps, pids, ...):
+            # it forms the static prefix of every request, followed by the tool
+            # schemas, with the user's query always placed last.
+            system_prompt = load_system_prompt().strip()
         else:
             raise ValueError("SYSTEM_PROMPT_FILE environment variable must be set.")
 
         tracing.trace_print("Using system prompt:", log_only=True)
         tracing.trace_print(system_prompt, log_only=True)
+        self.system_prompt = system_prompt
+
+        self._cache = None
+        if cache and self.temperature == 0:
+            self._cache = ResponseCache(os.getenv("AGENT_CACHE_DIR", ".agent_cache"), ttl=cache_ttl)
+        self._semantic_cache = SemanticCache(embeddings, threshold=semantic_threshold) if semantic_cache else None
 
         self.agent_executor = create_agent(self.llm, self.tools, system_prompt=system_prompt)
 
+        # Event loop shared by every async entry point (created on first use).
+        # Model clients such as ChatOllama keep pooled connections bound to
+        # the loop they were first used on, so a fresh loop per call breaks them.
+        self._runner = None
+
+        # Keep the response file open for the agent's lifetime (line-buffered,
+        # so each response is flushed) instead of reopening it per response.
+        self._response_fp = None
+        if self.response_file:
+            try:
+                self._response_fp = open(self.response_file, "a", encoding="utf-8", buffering=1)
+            except OSError as io_err:
+                tracing.trace_print(f"Warning: failed to open {self.response_file}: {io_err}")
+            else:
+                atexit.register(self.close)
+
+    def warmup(self) -> None:
+        """Ask the Ollama server to load the model without generating anything.
+
+        Failures are traced and otherwise ignored; the first query will then
+        load the model as usual. Has no effect for Gemini.
+        """
+        if self.provider != "ollama":
+            return
+        from ollama import Client
+
+        try:
+            # An empty prompt only loads the model (and applies keep_alive)
+            Client(host=self.base_url).generate(model=self.model_name, prompt="", keep_alive=self.keep_alive)
+        except Exception as e:
+            tracing.trace_print(f"Warning: failed to preload Ollama model {self.model_name}: {e}")
+
     def run(self, query: str) -> str:
         """Run the agent with a user query.
 
@@ -86,55 +214,174 @@ class FileAgent:
         Returns:
             The agent's response
         """
+        key, cached = self._cache_lookup(query)
+        if cached is None and self._semantic_cache is not None:
+            cached = self._semantic_cache.lookup(query)
+        if cached is not None:
+            self._append_response(cached)
+            return cached
+
         try:
-            result = self.agent_executor.invoke({"messages": [HumanMessage(content=query)]})
+            result = self.agent_executor.invoke(_agent_input(query))
+            out = self._handle_result(result)
+        except Exception as e:
+            return self._handle_error(query, e)
 
-            tracing.log_response(result)
+        return self._finish(query, key, out)
 
-            # Normalize access to messages whether `result` is a dict or an object
-            msgs = None
-            if hasattr(result, "messages"):
-                try:
-                    msgs = list(result.messages)
-                except Exception:
-                    msgs = result.messages
-            elif isinstance(result, dict) and "messages" in result:
-                msgs = result["messages"]
-
-            if msgs:
-                last = msgs[-1]
-                # Message may expose `.content` or be a mapping
-                if hasattr(last, "content"):
-                    out = normalize_content(last.content)
-                elif isinstance(last, dict) and "content" in last:
-                    out = normalize_content(last["content"])
-                else:
-                    out = normalize_content(last)
-
-                # Append to AI_RESPONSE_FILE and return
-                try:
-                    with open(self.response_file, "a", encoding="utf-8") as f:
-                        f.write(out + "\n")
-                except Exception as io_err:
-                    tracing.trace_print(f"Warning: failed to write {self.response_file}: {io_err}")
+    async def arun(self, query: str, record: bool = True) -> str:
+        """Asynchronously run the agent with a user query.
 
-                return out
+        Same as `run` but awaits the agent, so several queries can share one
+        event loop and overlap their round-trips to the LLM provider.
 
-            # Nothing matched; return a readable representation
-            out = normalize_content(result)
-            try:
-                with open(self.response_file, "a", encoding="utf-8") as f:
-                    f.write(out + "\n")
-            except Exception as io_err:
-                tracing.trace_print(f"Warning: failed to write {self.response_file}: {io_err}")
-            return out
+        Args:
+            query: The user's query or instruction
+            record: Append the response to the response file
+
+        Returns:
+            The agent's response
+        """
+        key, cached = await self._acache_lookup(query)
+        if cached is not None:
+            if record:
+                self._append_response(cached)
+            return cached
+
+        try:
+            result = await self.agent_executor.ainvoke(_agent_input(query))
+            out = self._handle_result(result)
         except Exception as e:
-            msg = str(e)
-            out = f"Error executing agent: {msg}"
-            tracing.trace_print(out)
-            return out
+            return self._handle_error(query, e)
+
+        return self._finish(query, key, out, record=record)
+
+    async def _run_many(self, queries: list[str]) -> list[str]:
+        """Run `queries` concurrently, honouring `max_concurrency`.
+
+        Responses complete in any order, so they are written to the response
+        file afterwards, one line per query in input order (errors included).
+        """
+        if not self.max_concurrency:
+            responses = await asyncio.gather(*[self.arun(q, record=False) for q in queries])
+        else:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
 
-        return "[ERROR] Running agent failed!"
+            async def _bounded(query: str) -> str:
+                async with semaphore:
+                    return await self.arun(query, record=False)
+
+            responses = await asyncio.gather(*[_bounded(q) for q in queries])
+
+        for response in responses:
+            self._append_response(response)
+        return responses
+
+    def run_batch(self, queries: list[str]) -> list[str]:
+        """Run several independent queries concurrently.
+
+        The process, model client and agent graph are shared by all queries,
+        which makes this much cheaper than invoking the CLI once per query.
+
+        Args:
+            queries: The user queries to execute
+
+        Returns:
+            The agent's responses, in the same order as `queries`
+        """
+        return self._run(self._run_many(queries))
+
+    def _run(self, coro):
+        """Run `coro` to completion on the agent's event loop.
+
+        Ctrl-C cancels the coroutine and raises KeyboardInterrupt, as with
+        asyncio.run, but the loop stays open for the next call.
+        """
+        if self._runner is None:
+            self._runner = asyncio.Runner()
+            atexit.register(self.close)
+        return self._runner.run(coro)
+
+    def _cache_lookup(self, query: str) -> tuple[str | None, str | None]:
+        """Return the cache key for `query` and the cached response, if any."""
+        if self._cache is None:
+            return None, None
+
+        key = ResponseCache.make_key(self.provider, self.model_name, self.system_prompt, query, self.temperature)
+        cached = self._cache.get(key)
+        if cached is not None:
+            tracing.trace_print("Using cached response", log_only=True)
+        return key, cached
+
+    async def _acache_lookup(self, query: str) -> tuple[str | None, str | None]:
+        """Async variant of the exact + semantic cache lookup used by `arun`."""
+        key, cached = self._cache_lookup(query)
+        if cached is None and self._semantic_cache is not None:
+            cached = await self._semantic_cache.alookup(query)
+        return key, cached
+
+    def _finish(self, query: str, key: str | None, out: str, record: bool = True) -> str:
+        """Cache and record a freshly generated response."""
+        if key is not None:
+            self._cache.set(key, out)
+        if self._semantic_cache is not None:
+            self._semantic_cache.add(query, out)
+        if record:
+            self._append_response(out)
+        return out
+
+    def _handle_result(self, result) -> str:
+        """Extract the final answer from an agent result."""
+        tracing.log_response(result)
+
+        # The agent graph returns a dict state; other result objects may
+        # expose `.messages` instead
+        if isinstance(result, dict):
+            msgs = result.get("messages")
+        else:
+            msgs = getattr(result, "messages", None)
+
+        if not msgs:
+            # Nothing matched; return a readable representation
+            return normalize_content(result)
+
+        last = msgs[-1]
+        # Message may expose `.content` or be a mapping
+        content = getattr(last, "content", None)
+        if content is None and isinstance(last, dict):
+            content = last.get("content")
+        return normalize_content(last if content is None else content)
+
+    def _append_response(self, out: str) -> None:
+        """Append a response to AI_RESPONSE_FILE."""
+        if self._response_fp is None:
+            return
+        try:
+            self._response_fp.write(out + "\n")
+        except Exception as io_err:
+            tracing.trace_print(f"Warning: failed to write {self.response_file}: {io_err}")
+
+    def close(self) -> None:
+        """Close the response file and event loop. Safe to call more than once."""
+        if self._response_fp is not None:
+            self._response_fp.close()
+            self._response_fp = None
+        if self._runner is not None:
+            self._runner.close()
+            self._runner = None
+
+    def _handle_error(self, query: str, error: Exception) -> str:
+        """Trace an agent failure for `query` and return it as the response text."""
+        # A failed query is never added, so drop the embedding its lookup kept
+        if self._semantic_cache is not None:
+            self._semantic_cache.discard(query)
+        msg = str(error)
+        if self.provider == "ollama" and (isinstance(error, ConnectionError) or _OLLAMA_CONN_ERR.search(msg)):
+            out = f"Error executing agent: cannot connect to Ollama at {self.base_url} ({msg}). Is the server running?"
+        else:
+            out = f"Error executing agent: {msg}"
+        tracing.trace_print(out)
+        return out
 
     def chat(self):
         """Start an interactive chat session with the agent."""
@@ -161,6 +408,86 @@ class FileAgent:
             except Exception as e:
                 tracing.trace_print(f"\nError: {str(e)}\n")
 
+        self.close()
+
+    async def _astream_answer(self, query: str) -> str:
+        """Stream the agent's output to stdout and return its final message."""
+        from langchain_core.messages import AIMessage
+
+        current_id = None
+        answer: list[str] = []
+        async for chunk, _metadata in self.agent_executor.astream(
+            _agent_input(query), stream_mode="messages"
+        ):
+            # Tool results are streamed too; only echo model output
+            if not isinstance(chunk, AIMessage):
+                continue
+            # A new message id starts a new model turn; the last one is the answer
+            if chunk.id != current_id:
+                current_id = chunk.id
+                answer = []
+            text = normalize_content(chunk.content)
+            if text:
+                answer.append(text)
+                if not tracing.is_silent():
+                    sys.stdout.write(text)
+                    sys.stdout.flush()
+        return "".join(answer)
+
+    async def _astream_turn(self, query: str) -> None:
+        """Answer one chat turn, streaming the response to stdout."""
+        key, cached = await self._acache_lookup(query)
+        if cached is not None:
+            self._append_response(cached)
+            tracing.trace_print(f"\nAgent: {cached}\n")
+            return
+
+        if not tracing.is_silent():
+            sys.stdout.write("\nAgent: ")
+        try:
+            response = await self._astream_answer(query)
+        except Exception as e:
+            self._handle_error(query, e)
+            return
+        if not tracing.is_silent():
+            sys.stdout.write("\n\n")
+        tracing.trace_print(f"Agent: {response}", log_only=True)
+        self._finish(query, key, response)
+
+    def chat_stream(self):
+        """Start an interactive chat session that streams responses as they are generated.
+
+        Tokens are printed as they arrive; the complete answer is then logged
+        and appended to the response file in a single write. The prompt is
+        read synchronously and every turn runs on the agent's event loop, so
+        the model client keeps its connections between turns and Ctrl-C ends
+        the session at the prompt and while an answer streams.
+        """
+        tracing.trace_print(f"Starting chat with {self.provider.upper()} agent...")
+        tracing.trace_print("Type 'exit' or 'quit' to end the session.\n")
+
+        try:
+            while True:
+                try:
+                    user_input = input("You: ").strip()
+
+                    if user_input.lower() in ["exit", "quit"]:
+                        tracing.trace_print("Goodbye!")
+                        break
+
+                    if not user_input:
+                        continue
+
+                    self._run(self._astream_turn(user_input))
+
+                except KeyboardInterrupt:
+                    tracing.trace_print("\n\nGoodbye!")
+                    break
+                except Exception as e:
+                    tracing.trace_print(f"\nError: {str(e)}\n")
+        finally:
+            self.close()
+
 
 def main():
     """Main entry point for the agent script."""
@@ -190,6 +517,45 @@ def main():
         type=str,
         help="Single query to execute (if not provided, starts interactive mode)",
     )
+    parser.add_argument(
+        "--batch-file",
+        "--queries-file",
+        dest="batch_file",
+        type=str,
+        help="File with one query per line; queries are executed concurrently "
+        "and their responses appended to --response-file in the same order",
+    )
+    parser.add_argument(
+        "--temperature",
+        type=float,
+        default=0.1,
+        help="Sampling temperature (default: 0.1). Use 0 to enable response caching",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not reuse cached responses for identical queries",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        help="Maximum age in seconds of cached responses (default: no expiry)",
+    )
+    parser.add_argument(
+        "--semantic-cache",
+        action="store_true",
+        help="Reuse responses of similar earlier queries (embedding similarity)",
+    )
+    parser.add_argument(
+        "--no-stream",
+        action="store_true",
+        help="In interactive mode, print each response only once it is complete",
+    )
+    parser.add_argument(
+        "--warmup",
+        action="store_true",
+        help="Preload the Ollama model at startup so the first query is not delayed by model loading",
+    )
     parser.add_argument(
         "--silent",
         action="store_true",
@@ -201,16 +567,39 @@ def main():
     try:
         # Configure tracer silent mode if requested
         tracing.set_silent(args.silent)
-        agent = FileAgent(provider=args.provider, model=args.model, response_file=args.response_file)
-
-        if args.query:
+        agent = FileAgent(
+            provider=args.provider,
+            model=args.model,
+            response_file=args.response_file,
+            temperature=args.temperature,
+            cache=not args.no_cache,
+            cache_ttl=args.cache_ttl,
+            semantic_cache=args.semantic_cache,
+            warmup=args.warmup,
+        )
+
+        if args.batch_file:
+            # Batch mode: one query per non-empty line, dispatched concurrently
+            with open(args.batch_file, "r", encoding="utf-8") as f:
+                queries = [line.strip() for line in f if line.strip()]
+            responses = agent.run_batch(queries)
+            for query, response in zip(queries, responses):
+                tracing.trace_print(f"\n\nQuery: {query}\nAgent response:\n{response}")
+        elif args.query:
             # Single query mode
             response = agent.run(args.query)
             tracing.trace_print(f"\n\nAgent response:\n{response}")
-        else:
+        elif args.no_stream:
             # Interactive mode
             agent.chat()
+        else:
+            # Interactive mode, streaming tokens as they are generated
+            agent.chat_stream()
 
+    except KeyboardInterrupt:
+        # Interrupted outside the chat loop (e.g. during startup or a query)
+        tracing.trace_print("\n\nGoodbye!")
+        return 130
     except Exception as e:
         tracing.trace_print(f"Error initializing agent: {str(e)}")
         return 1
@@ -0,0 +1,145 @@
+"""Response caching helpers for agenttools.
+
+Provides `ResponseCache`, a small on-disk exact-match cache used by
+FileAgent to skip the LLM round-trip for prompts it has already answered.
+Each entry is stored as a JSON file named after the blake2b digest of the
+request parameters, so the cache survives process restarts and can be
+shared between CLI invocations.
+
+`SemanticCache` complements it for paraphrased queries: it embeds each
+query and returns a previous response when the cosine similarity with an
+earlier query exceeds a threshold.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+
+class ResponseCache:
+    """Exact-match cache of agent responses stored under `directory`."""
+
+    def __init__(self, directory: str, ttl: Optional[float] = None):
+        """Create a cache rooted at `directory`.
+
+        Args:
+            directory: Directory where cache entries are stored (created lazily)
+            ttl: Optional time-to-live in seconds; older entries are ignored
+        """
+        self.directory = directory
+        self.ttl = ttl
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Return a stable digest for the given JSON-serializable parts."""
+        raw = json.dumps(list(parts), sort_keys=True, ensure_ascii=False)
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=20).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for `key`, or None on miss/expiry."""
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if self.ttl is not None and entry.get("created", 0) < time.time() - self.ttl:
+            return None
+        return entry.get("response")
+
+    def set(self, key: str, response: str) -> None:
+        """Store `response` under `key`. Failures are silently ignored."""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Write to a temporary file first so readers never see partial entries
+            tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"created": time.time(), "response": response}, f)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            pass
+
+
+class SemanticCache:
+    """In-memory cache that matches queries by embedding similarity.
+
+    `embeddings` is any LangChain `Embeddings` implementation (for example
+    OllamaEmbeddings). Vectors are L2-normalized on insertion so that the
+    inner product equals the cosine similarity.
+    """
+
+    def __init__(self, embeddings: Any, threshold: float = 0.92):
+        """Create an empty cache.
+
+        Args:
+            embeddings: Object providing `embed_query` / `aembed_query`
+            threshold: Minimum cosine similarity for a cache hit
+        """
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self._vectors: List[List[float]] = []
+        self._responses: List[str] = []
+        # Embeddings of missed queries, kept so `add` does not embed twice
+        self._pending: Dict[str, List[float]] = {}
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> List[float]:
+        norm = math.sqrt(sum(x * x for x in vector))
+        return [x / norm for x in vector] if norm else list(vector)
+
+    def _search(self, query: str, vector: List[float]) -> Optional[str]:
+        vector = self._normalize(vector)
+        best = None
+        best_score = self.threshold
+        for i, other in enumerate(self._vectors):
+            score = sum(a * b for a, b in zip(vector, other))
+            if score >= best_score:
+                best, best_score = i, score
+
+        if best is None:
+            self._pending[query] = vector
+            return None
+        return self._responses[best]
+
+    def lookup(self, query: str) -> Optional[str]:
+        """Return the response of the most similar cached query, if close enough."""
+        try:
+            vector = self.embeddings.embed_query(query)
+        except Exception:
+            # Caching is best-effort; an unavailable embedding model is a miss
+            return None
+        return self._search(query, vector)
+
+    async def alookup(self, query: str) -> Optional[str]:
+        """Async variant of `lookup`."""
+        try:
+            vector = await self.embeddings.aembed_query(query)
+        except Exception:
+            return None
+        return self._search(query, vector)
+
+    def discard(self, query: str) -> None:
+        """Forget the embedding kept for a missed `query` that will not be added."""
+        self._pending.pop(query, None)
+
+    def add(self, query: str, response: str) -> None:
+        """Remember `response` as the answer to `query`."""
+        vector = self._pending.pop(query, None)
+        if vector is None:
+            try:
+                vector = self._normalize(self.embeddings.embed_query(query))
+            except Exception:
+                return
+        self._vectors.append(vector)
+        self._responses.append(response)
+
+
+__all__ = ["ResponseCache", "SemanticCache"]
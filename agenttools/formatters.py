@@ -4,7 +4,51 @@ This module provides helpers to normalize various LLM/agent response
 shapes into plain human-readable strings.
 """
 
-from typing import Any
+from typing import Any, Iterator
+
+# Keys checked, in order, when a dict wraps the actual message text
+_CONTENT_KEYS = ("text", "content", "message", "body", "answer")
+
+
+def _walk(content: Any) -> Iterator[str]:
+    """Yield the non-empty leaf strings of `content`, in document order."""
+    stack = [content]
+    while stack:
+        item = stack.pop()
+        if item is None:
+            continue
+
+        # Strings and simple scalars
+        if isinstance(item, str):
+            if item:
+                yield item
+            continue
+        if isinstance(item, (int, float, bool)):
+            yield str(item)
+            continue
+
+        # Dicts: use the first common key present, else all values in order
+        if isinstance(item, dict):
+            for key in _CONTENT_KEYS:
+                if key in item:
+                    stack.append(item[key])
+                    break
+            else:
+                stack.extend(reversed(list(item.values())))
+            continue
+
+        # Lists / tuples: push items reversed so they pop in order
+        if isinstance(item, (list, tuple)):
+            stack.extend(reversed(item))
+            continue
+
+        # Fallback to string conversion
+        try:
+            text = str(item)
+        except Exception:
+            continue
+        if text:
+            yield text
 
 
 def normalize_content(content: Any) -> str:
@@ -16,48 +60,16 @@ def normalize_content(content: Any) -> str:
     - dicts like {'type': 'text', 'text': '...'} or {'content': '...'}
     - lists/tuples of the above
     - nested structures
-    """
-    if content is None:
-        return ""
 
-    # Strings and simple scalars
-    if isinstance(content, str):
+    Leaf strings of the whole tree are streamed into a single join, so nested
+    provider messages never build intermediate strings.
+    """
+    # Plain strings are by far the most common shape; an exact type check
+    # skips the walk (str subclasses take the general path)
+    if type(content) is str:
         return content
-    if isinstance(content, (int, float, bool)):
-        return str(content)
-
-    # Dicts: try common keys first
-    if isinstance(content, dict):
-        for key in ("text", "content", "message", "body", "answer"):
-            if key in content:
-                return normalize_content(content[key])
-
-        # Some providers use {'type': 'text', 'text': '...'}
-        if content.get("type") in ("text", "message") and "text" in content:
-            return normalize_content(content["text"])
-
-        # Fallback: collect and join any stringifiable values
-        parts = []
-        for v in content.values():
-            t = normalize_content(v)
-            if t:
-                parts.append(t)
-        return " ".join(parts)
-
-    # Lists / tuples: join normalized parts with spaces
-    if isinstance(content, (list, tuple)):
-        parts = []
-        for item in content:
-            t = normalize_content(item)
-            if t:
-                parts.append(t)
-        return " ".join(parts)
-
-    # Fallback to string conversion
-    try:
-        return str(content)
-    except Exception:
-        return ""
+
+    return " ".join(_walk(content))
 
 
 __all__ = ["normalize_content"]
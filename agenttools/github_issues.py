@@ -7,34 +7,64 @@ posts it to the GitHub Issues Comments API.
 It uses the GITHUB_TOKEN environment variable by default but accepts an
 optional `token` argument for override. For tests or dry runs, set
 `dry_run=True` to get the composed payload without making network calls.
+
+For bulk automation, `send_issue_comments` / `send_issue_comments_async`
+post many comments concurrently.
 """
 
 from __future__ import annotations
 
-import os
-from typing import Optional, Dict, Any
-import json
+import asyncio
+from typing import Optional, Dict, Any, Iterable, List, Union
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from agenttools._auth import resolve_token as _resolve_token
+from agenttools._json import dumps as _dumps, loads as _loads
 
 GITHUB_API_BASE = "https://api.github.com"
 
+# Upper bound on concurrent comment requests; GitHub's secondary rate
+# limits penalize large bursts of concurrent writes.
+MAX_CONCURRENT_COMMENTS = 10
+
+# Shared session so consecutive comments reuse the pooled keep-alive
+# connection instead of paying a TCP+TLS handshake per request. Retries
+# cover connection failures, honouring Retry-After; status-based retries
+# only apply to idempotent methods, so a comment is never posted twice.
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=MAX_CONCURRENT_COMMENTS,
+        pool_maxsize=MAX_CONCURRENT_COMMENTS,
+        max_retries=Retry(
+            total=5,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        ),
+    ),
+)
+
 
 def _compose_comment(issue_number: int, title: Optional[str], body: Optional[str], action: Optional[str], issue_url: Optional[str]) -> str:
     """Return a Markdown comment string composed from provided pieces."""
-    parts = []
-    if action:
-        parts.append(f"**Action:** {action}")
-    if title:
-        parts.append(f"**Issue:** {title}")
-    if body:
-        parts.append("---")
-        parts.append(body)
-    if issue_url:
-        parts.append(f"[View issue]({issue_url})")
-
-    parts.append(f"_Posted by automation for issue #{issue_number}_")
-    return "\n\n".join(parts)
+    return "\n\n".join(
+        part
+        for part in (
+            action and f"**Action:** {action}",
+            title and f"**Issue:** {title}",
+            body and "---",
+            body,
+            issue_url and f"[View issue]({issue_url})",
+            f"_Posted by automation for issue #{issue_number}_",
+        )
+        if part
+    )
 
 
 def send_issue_comment(
@@ -74,9 +104,7 @@ def send_issue_comment(
     if not issue_number or issue_number <= 0:
         raise ValueError("issue_number must be a positive integer")
 
-    token = token or os.getenv("GITHUB_TOKEN")
-    if not token and not dry_run:
-        raise ValueError("GITHUB_TOKEN must be set in environment or passed as token")
+    token = _resolve_token(token, required=not dry_run)
 
     comment_text = _compose_comment(issue_number, title, body, action, issue_url)
     payload = {"body": comment_text}
@@ -93,7 +121,7 @@ def send_issue_comment(
         "Content-Type": "application/json",
     }
 
-    resp = requests.post(post_url, headers=headers, data=json.dumps(payload), timeout=10)
+    resp = _SESSION.post(post_url, headers=headers, data=_dumps(payload), timeout=10)
 
     try:
         resp.raise_for_status()
@@ -102,4 +130,47 @@ def send_issue_comment(
         msg = f"Failed to post comment: {resp.status_code} {resp.text}"
         raise requests.HTTPError(msg, response=resp)
 
-    return {"url": resp.json().get("html_url"), "payload": payload, "response": resp.json()}
+    data = _loads(resp.content)
+    return {"url": data.get("html_url"), "payload": payload, "response": data}
+
+
+async def send_issue_comments_async(
+    items: Iterable[Dict[str, Any]],
+    token: Optional[str] = None,
+    dry_run: bool = False,
+    max_concurrency: int = MAX_CONCURRENT_COMMENTS,
+) -> List[Union[Dict[str, Any], Exception]]:
+    """Post several issue comments concurrently.
+
+    Args:
+        items: dicts of `send_issue_comment` keyword arguments, each with at
+            least 'repo_full_name' and 'issue_number'
+        token: optional GitHub token used for every comment
+        dry_run: if True, only compose the payloads
+        max_concurrency: maximum number of requests in flight
+
+    Returns:
+        One entry per item, in order: the `send_issue_comment` result dict,
+        or the exception raised for that item.
+    """
+    # Resolve the token once for the whole batch; a missing one is still
+    # reported per item by send_issue_comment
+    token = _resolve_token(token, required=False)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _send(item: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            # Each request runs on a worker thread over the shared session
+            return await asyncio.to_thread(send_issue_comment, token=token, dry_run=dry_run, **item)
+
+    return await asyncio.gather(*[_send(item) for item in items], return_exceptions=True)
+
+
+def send_issue_comments(
+    items: Iterable[Dict[str, Any]],
+    token: Optional[str] = None,
+    dry_run: bool = False,
+    max_concurrency: int = MAX_CONCURRENT_COMMENTS,
+) -> List[Union[Dict[str, Any], Exception]]:
+    """Synchronous wrapper around `send_issue_comments_async`."""
+    return asyncio.run(send_issue_comments_async(items, token=token, dry_run=dry_run, max_concurrency=max_concurrency))
@@ -1,29 +1,214 @@
 """Utilities to create a GitHub Pull Request from a local git repo/branch.
 
 This module provides:
-- get_git_diff(git_dir, base_branch, head_branch) -> str
+- get_git_diff(git_dir, base_branch, head_branch) -> str (memoized; see clear_diff_cache)
 - parse_repo_full_name(repo_url) -> str (owner/repo)
 - create_pull_request(repo_full_name, head, base, title, body, token, dry_run)
 
-The functions use `git` via subprocess for diffs and the GitHub REST API
-for creating the pull request.
+The functions use `git` via subprocess for diffs (or libgit2 in-process when
+the optional `pygit2` package is installed) and the GitHub REST API for
+creating the pull request.
 """
 
 from __future__ import annotations
 
+import contextlib
+import functools
+import mmap
 import os
+from concurrent.futures import ThreadPoolExecutor
 import re
+import stat
 import subprocess
-from typing import Optional, Tuple, Dict, Any
-import json
+from typing import Optional, Tuple, Dict, Any, Iterator
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import base64
 import hashlib
 
+from agenttools._auth import resolve_token as _resolve_token
+from agenttools._json import dumps as _dumps, loads as _loads
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+try:
+    import pygit2
+except ImportError:  # optional speedup; fall back to the git CLI
+    pygit2 = None
+
 GITHUB_API_BASE = "https://api.github.com"
 
+# hashlib.file_digest is only available on Python 3.11+
+_file_digest = getattr(hashlib, "file_digest", None)
+
+# Upper bound on concurrent GitHub API requests (blob uploads); keeps us clear
+# of GitHub's secondary rate limits
+MAX_CONCURRENT_REQUESTS = 8
+
+# Shared session so the many API calls of a push reuse pooled keep-alive
+# connections instead of paying a TCP+TLS handshake per request. Retries
+# cover connection failures and transient 429/5xx answers, waiting as long
+# as a Retry-After header asks. Status-based retries are limited to reads and
+# the ref PATCH (which only moves a ref to a fixed SHA): a Contents API PUT or
+# DELETE commits on the branch, so a retry after a 5xx that had in fact
+# succeeded would be sent with a stale sha and fail.
+# The per-host pool is sized from MAX_CONCURRENT_REQUESTS with headroom, so
+# worker threads never wait for (or discard) a pooled connection.
+_SESSION = requests.Session()
+_SESSION.headers.update({"Accept": "application/vnd.github+json", "User-Agent": "agenttools"})
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=8,
+        pool_maxsize=2 * MAX_CONCURRENT_REQUESTS,
+        max_retries=Retry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=[429, 502, 503, 504],
+            allowed_methods=frozenset({"GET", "HEAD", "PATCH"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        ),
+    ),
+)
+
+# Repository specs accepted by parse_repo_full_name
+_OWNER_REPO_RE = re.compile(r"^[\w.-]+\/[\w.-]+$")
+_GIT_URL_RE = re.compile(r"^(?:https?://github.com/|git@github.com:)([^/]+/[^/.]+)(?:\.git)?$")
+
+# Read buffer for git subprocess pipes
+_PIPE_BUFSIZE = 1 << 16
+
+# Largest kernel pipe buffer requested for `git diff` (the default
+# /proc/sys/fs/pipe-max-size for unprivileged processes). Linux only.
+_PIPE_MAX_SIZE = 1 << 20
+_F_SETPIPE_SZ = getattr(fcntl, "F_SETPIPE_SZ", None) if fcntl is not None else None
+
+# Read size and thread count when hashing local files
+_HASH_CHUNK = 1 << 20
+_HASH_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+
+# Files at least this large are memory-mapped when encoding upload payloads;
+# below one page the mapping costs more than the copy it saves
+_MMAP_MIN_SIZE = 4096
+
+# Diffs already computed in this process, keyed by the resolved commit SHAs
+_DIFF_CACHE: Dict[Tuple[Any, ...], str] = {}
+_DIFF_CACHE_SIZE = 32
+
+
+def clear_diff_cache() -> None:
+    """Forget all diffs memoized by get_git_diff."""
+    _DIFF_CACHE.clear()
+
+
+def _resolve_shas(git_dir: str, *refs: str) -> Optional[Tuple[str, ...]]:
+    """Return the commit SHAs of `refs`, or None if any of them cannot be resolved."""
+    proc = subprocess.run(["git", "-C", git_dir, "rev-parse", *refs], check=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    shas = tuple(proc.stdout.decode("utf-8", errors="replace").split())
+    if proc.returncode != 0 or len(shas) != len(refs):
+        return None
+    return shas
+
+
+def _iter_nul_fields(stream) -> Iterator[bytes]:
+    """Yield the NUL-terminated fields of `git ... -z` output read from `stream`."""
+    pending = b""
+    for chunk in iter(lambda: stream.read(_PIPE_BUFSIZE), b""):
+        fields = (pending + chunk).split(b"\0")
+        pending = fields.pop()
+        yield from fields
+    if pending:
+        yield pending
+
+
+def _local_mode(path: str) -> str:
+    """Return the git tree mode of the file at `path`, without following symlinks."""
+    st = os.lstat(path)
+    if stat.S_ISLNK(st.st_mode):
+        return "120000"
+    return "100755" if st.st_mode & stat.S_IXUSR else "100644"
+
+
+def _link_target(path: str) -> bytes:
+    """Return the target of the symlink at `path`; git stores it as the blob content."""
+    return os.fsencode(os.readlink(path))
+
+
+def _blob_sha(path: str) -> str:
+    """Return the git blob SHA-1 of the file at `path`, hashed in chunks.
+
+    Symlinks are hashed by their target, as git does, rather than followed.
+    """
+    if os.path.islink(path):
+        target = _link_target(path)
+        return hashlib.sha1(b"blob %d\0" % len(target) + target).hexdigest()
+    with open(path, "rb") as fh:
+        h = hashlib.sha1(f"blob {os.fstat(fh.fileno()).st_size}\0".encode("utf-8"))
+        if _file_digest is not None:
+            # Python 3.11+: the read/update loop runs in C
+            return _file_digest(fh, lambda: h).hexdigest()
+        for chunk in iter(lambda: fh.read(_HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@contextlib.contextmanager
+def _file_view(path: str) -> Iterator[Any]:
+    """Yield the contents of `path` as a bytes-like object.
+
+    Files of _MMAP_MIN_SIZE bytes or more are memory-mapped, so encoders read
+    them straight from the page cache instead of from a copy.
+    """
+    with open(path, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size < _MMAP_MIN_SIZE:
+            yield fh.read()
+            return
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+
+def _b64_file(path: str) -> str:
+    """Return the base64 encoding of the file at `path`."""
+    with _file_view(path) as data:
+        return base64.b64encode(data).decode("ascii")
+
 
+def _blob_payload(data: Any) -> Dict[str, str]:
+    """Return the POST /git/blobs payload for the bytes-like `data`.
+
+    UTF-8 text is sent as-is, avoiding base64's 4/3 size overhead; binary
+    content falls back to base64.
+    """
+    try:
+        return {"content": str(data, "utf-8"), "encoding": "utf-8"}
+    except UnicodeDecodeError:
+        return {"content": base64.b64encode(data).decode("ascii"), "encoding": "base64"}
+
+
+def _ls_tree(git_dir: str, commit: str) -> Optional[Dict[str, str]]:
+    """Return a path -> blob SHA map of `commit`, or None if it is not available locally."""
+    proc = subprocess.run(["git", "-C", git_dir, "ls-tree", "-r", "-z", commit], check=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        return None
+    tree = {}
+    # records are "<mode> <type> <sha>\t<path>", NUL-terminated
+    for record in proc.stdout.split(b"\0"):
+        meta, sep, path = record.partition(b"\t")
+        if not sep:
+            continue
+        _mode, kind, sha = meta.split(b" ")
+        if kind == b"blob":
+            tree[path.decode("utf-8", errors="replace")] = sha.decode("ascii")
+    return tree
+
+
+@functools.lru_cache(maxsize=256)
 def parse_repo_full_name(repo_url: str) -> str:
     """Return 'owner/repo' parsed from a git remote URL.
 
@@ -36,67 +221,137 @@ def parse_repo_full_name(repo_url: str) -> str:
         raise ValueError("repo_url is required")
 
     # If already owner/repo
-    if re.match(r"^[\w.-]+\/[\w.-]+$", repo_url):
+    if _OWNER_REPO_RE.match(repo_url):
         return repo_url
 
-    m = re.match(r"^(?:https?://github.com/|git@github.com:)([^/]+/[^/.]+)(?:\.git)?$", repo_url)
+    m = _GIT_URL_RE.match(repo_url)
     if m:
         return m.group(1)
 
     raise ValueError(f"Could not parse repository full name from '{repo_url}'")
 
 
-def get_git_diff(git_dir: str, base_branch: str, head_branch: Optional[str] = None, max_bytes: int = 200_000, use_remote: bool = True) -> str:
+def _read_diff_pygit2(git_dir: str, base_sha: str, head_sha: str, limit: int) -> Optional[bytes]:
+    """Return up to `limit` bytes of the base..head patch computed in-process with libgit2.
+
+    Returns None when the repository cannot be opened or diffed, so the caller
+    falls back to `git diff`.
+    """
+    try:
+        repo = pygit2.Repository(git_dir)
+        diff = repo.diff(repo[base_sha].peel(pygit2.Commit), repo[head_sha].peel(pygit2.Commit), context_lines=3)
+        # git diff detects renames by default; libgit2 only does when asked
+        diff.find_similar()
+        out = bytearray()
+        for patch in diff:
+            out += patch.data
+            if len(out) >= limit:
+                break
+        return bytes(out[:limit])
+    except (pygit2.GitError, KeyError, ValueError):
+        return None
+
+
+def _read_diff_git(git_dir: str, base_ref: str, head_ref: str, limit: int) -> bytes:
+    """Return up to `limit` bytes of `git diff base_ref..head_ref`, stopping git once reached."""
+    diff_cmd = ["git", "-C", git_dir, "diff", "--no-color", f"{base_ref}..{head_ref}"]
+    # Stream the diff instead of buffering all of it.
+    # A failing git diff simply yields whatever it printed (usually nothing).
+    proc = subprocess.Popen(diff_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=_PIPE_BUFSIZE)
+    if _F_SETPIPE_SZ is not None:
+        # Let git write the whole allowed diff without blocking on a full
+        # 64 KiB pipe, so we wake up for fewer, larger reads
+        try:
+            fcntl.fcntl(proc.stdout.fileno(), _F_SETPIPE_SZ, min(limit, _PIPE_MAX_SIZE))
+        except (OSError, ValueError):
+            pass  # best effort: keep the default pipe size
+    try:
+        data = proc.stdout.read(limit)
+        if len(data) >= limit:
+            proc.kill()
+    finally:
+        proc.stdout.close()
+        proc.wait()
+    return data
+
+
+def get_git_diff(git_dir: str, base_branch: str, head_branch: Optional[str] = None, max_bytes: int = 200_000, use_remote: bool = True, shallow: bool = False) -> str:
     """Return the git diff between base_branch and head_branch in the given git_dir.
 
-    The function does a `git fetch` and then runs:
+    The function fetches only the two branches from origin and then runs:
       git -C <git_dir> diff --no-color origin/<base_branch>..origin/<head_branch>
 
+    If head_branch has not been pushed yet, only the base branch is fetched
+    and the local head_branch is compared against origin/<base_branch>.
+
+    With `shallow=True` the fetch uses `--depth=1`, which is enough for a
+    two-dot diff between the branch tips.
+
     If the diff is larger than `max_bytes`, it will be truncated with a note.
     """
     if not os.path.isdir(git_dir):
         raise ValueError(f"git_dir not found: {git_dir}")
 
+    # If head_branch not provided, detect the current branch in the repo
+    if not head_branch:
+        try:
+            proc = subprocess.run(["git", "-C", git_dir, "rev-parse", "--abbrev-ref", "HEAD"], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            head_branch = proc.stdout.decode("utf-8", errors="replace").strip()
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"failed to determine current branch: {e.stderr.decode('utf-8', 'ignore')}")
+
     # If using remote refs, fetch from origin and compare origin/<base>..origin/<head>
     if use_remote:
+        # Fetch only the two refs we compare rather than every ref of every remote
+        fetch_cmd = ["git", "-C", git_dir, "fetch", "--no-tags", "--prune"]
+        if shallow:
+            fetch_cmd.append("--depth=1")
+        fetch_cmd += ["origin", base_branch]
+        base_ref, head_ref = f"origin/{base_branch}", f"origin/{head_branch}"
         try:
-            subprocess.run(["git", "-C", git_dir, "fetch", "--all"], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            subprocess.run(fetch_cmd + [head_branch], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
         except subprocess.CalledProcessError as e:
-            raise RuntimeError(f"git fetch failed: {e.stderr.decode('utf-8', 'ignore')}")
-
-        # If head_branch not provided, detect the current branch in the repo
-        if not head_branch:
+            err = e.stderr.decode("utf-8", "ignore")
+            if f"fatal: couldn't find remote ref {head_branch}" not in err.splitlines():
+                raise RuntimeError(f"git fetch failed: {err}")
+            # Head not pushed yet: fetch the base alone and diff the local head
             try:
-                proc = subprocess.run(["git", "-C", git_dir, "rev-parse", "--abbrev-ref", "HEAD"], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                head_branch = proc.stdout.decode("utf-8", errors="replace").strip()
+                subprocess.run(fetch_cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
             except subprocess.CalledProcessError as e:
-                raise RuntimeError(f"failed to determine current branch: {e.stderr.decode('utf-8', 'ignore')}")
-
-        diff_cmd = ["git", "-C", git_dir, "diff", "--no-color", f"origin/{base_branch}..origin/{head_branch}"]
+                raise RuntimeError(f"git fetch failed: {e.stderr.decode('utf-8', 'ignore')}")
+            head_ref = head_branch
     else:
-        # Local comparison: do not fetch; compare local refs base..head (or HEAD if head not given)
-        if not head_branch:
-            try:
-                proc = subprocess.run(["git", "-C", git_dir, "rev-parse", "--abbrev-ref", "HEAD"], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                head_branch = proc.stdout.decode("utf-8", errors="replace").strip()
-            except subprocess.CalledProcessError as e:
-                raise RuntimeError(f"failed to determine current branch: {e.stderr.decode('utf-8', 'ignore')}")
-
-        # Compare committed changes between branches
-        diff_cmd = ["git", "-C", git_dir, "diff", "--no-color", f"{base_branch}..{head_branch}"]
-    try:
-        proc = subprocess.run(diff_cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        diff = proc.stdout.decode("utf-8", errors="replace")
-    except subprocess.CalledProcessError as e:
-        # git diff returns exit code 1 when diffs exist; handle by capturing stdout
-        diff = e.stdout.decode("utf-8", errors="replace") if hasattr(e, 'stdout') and e.stdout else ''
-
-    if len(diff.encode("utf-8")) > max_bytes:
-        note = f"\n\n[Diff truncated: original size {len(diff)} chars]\n"
-        # keep only first max_bytes worth of characters (approx)
-        truncated = diff.encode("utf-8")[:max_bytes].decode("utf-8", errors="ignore")
-        return truncated + note
+        # Local comparison: do not fetch; compare committed changes between local refs
+        base_ref, head_ref = base_branch, head_branch
+
+    # The diff only depends on the two commits, so reuse it while neither ref moved
+    shas = _resolve_shas(git_dir, base_ref, head_ref)
+    cache_key = (os.path.abspath(git_dir), base_branch, head_branch, use_remote, max_bytes, shas)
+    if shas is not None and cache_key in _DIFF_CACHE:
+        return _DIFF_CACHE[cache_key]
+
+    # Read one byte past the limit to tell whether the diff was truncated. With
+    # pygit2 installed the diff is computed in-process, without spawning git.
+    data = None
+    if pygit2 is not None and shas is not None:
+        data = _read_diff_pygit2(git_dir, shas[0], shas[1], max_bytes + 1)
+    if data is None:
+        data = _read_diff_git(git_dir, base_ref, head_ref, max_bytes + 1)
+    truncated = len(data) > max_bytes
+
+    if truncated:
+        note = f"\n\n[Diff truncated: output exceeds {max_bytes} bytes]\n"
+        # cut at max_bytes, dropping a partial multi-byte character at the end;
+        # decoding through a memoryview avoids copying the kept bytes first
+        diff = str(memoryview(data)[:max_bytes], "utf-8", "ignore") + note
+    else:
+        diff = data.decode("utf-8", errors="replace")
 
+    if shas is not None:
+        if len(_DIFF_CACHE) >= _DIFF_CACHE_SIZE:
+            # Drop the oldest entry (dicts keep insertion order)
+            _DIFF_CACHE.pop(next(iter(_DIFF_CACHE)))
+        _DIFF_CACHE[cache_key] = diff
     return diff
 
 
@@ -128,9 +383,7 @@ def create_pull_request(
     if "/" not in repo_full_name:
         raise ValueError("repo_full_name must be 'owner/repo'")
 
-    token = token or os.getenv("GITHUB_TOKEN")
-    if not token and not dry_run:
-        raise ValueError("GITHUB_TOKEN must be set in environment or passed as token")
+    token = _resolve_token(token, required=not dry_run)
 
     owner, repo = repo_full_name.split("/", 1)
     pr_title = title or f"Automated PR: {head} -> {base}"
@@ -141,16 +394,18 @@ def create_pull_request(
         return {"payload": payload, "url": None, "pr_url": None, "branch_url": branch_url, "response": None}
 
     post_url = f"{GITHUB_API_BASE}/repos/{owner}/{repo}/pulls"
-    headers = {"Authorization": f"Bearer {token}", "Accept": "application/vnd.github+json", "Content-Type": "application/json"}
+    headers = {"Authorization": f"Bearer {token}"}
 
-    resp = requests.post(post_url, headers=headers, data=json.dumps(payload), timeout=10)
+    # json= serializes the payload and sets Content-Type
+    resp = _SESSION.post(post_url, headers=headers, json=payload, timeout=10)
     try:
         resp.raise_for_status()
     except Exception:
         raise requests.HTTPError(f"Failed to create PR: {resp.status_code} {resp.text}", response=resp)
 
-    pr_url = resp.json().get("html_url")
-    return {"payload": payload, "url": pr_url, "pr_url": pr_url, "branch_url": branch_url, "response": resp.json()}
+    data = resp.json()
+    pr_url = data.get("html_url")
+    return {"payload": payload, "url": pr_url, "pr_url": pr_url, "branch_url": branch_url, "response": data}
 
 
 def create_pr_from_git(
@@ -183,222 +438,330 @@ def push_branch_via_api(git_dir: str, repo_url: str, base: str, head: str, token
     """Push changes from local branch `head` into the remote repository using the GitHub API.
 
     This implements a file-level push using the Contents API: it inspects
-    `git -C <git_dir> diff --name-status <base>.. <head>` to discover added,
+    `git -C <git_dir> diff -z --name-status <base>..<head>` to discover added,
     modified and deleted files and applies those changes on the target branch
-    via the GitHub REST API.
+    via the GitHub REST API. Current blob SHAs on the branch come from
+    `git ls-tree` when its commit exists locally, else from the API.
 
     Limitations:
-    - Renames and copy operations are treated as delete+add.
+    - Renames are treated as delete+add; copies as an add of the new path.
     - Large changes or many files may hit rate/size limits; in that case use regular git push.
     - This replays the final content of files as present on disk in `git_dir`.
 
     Returns a dict with 'branch_url' and a list of 'operations' performed.
     """
-    token = token or os.getenv("GITHUB_TOKEN")
-    if not token:
-        raise ValueError("GITHUB_TOKEN must be set in environment or passed as token")
+    token = _resolve_token(token)
 
     repo_full = parse_repo_full_name(repo_url)
     owner, repo = repo_full.split("/", 1)
-    headers = {"Authorization": f"Bearer {token}", "Accept": "application/vnd.github+json"}
+    headers = {"Authorization": f"Bearer {token}"}
 
     # Ensure branch exists: get base commit SHA then create head ref if missing
     ref_url = f"{GITHUB_API_BASE}/repos/{owner}/{repo}/git/ref/heads/{base}"
-    r = requests.get(ref_url, headers=headers, timeout=timeout)
+    r = _SESSION.get(ref_url, headers=headers, timeout=timeout)
     if r.status_code != 200:
         raise RuntimeError(f"Failed to get base ref {base}: {r.status_code} {r.text}")
     base_sha = r.json()["object"]["sha"]
 
     # Try to get head ref; if 404 create it from base
     head_ref_url = f"{GITHUB_API_BASE}/repos/{owner}/{repo}/git/ref/heads/{head}"
-    r = requests.get(head_ref_url, headers=headers, timeout=timeout)
+    r = _SESSION.get(head_ref_url, headers=headers, timeout=timeout)
     if r.status_code == 404:
         create_ref_payload = {"ref": f"refs/heads/{head}", "sha": base_sha}
-        r = requests.post(f"{GITHUB_API_BASE}/repos/{owner}/{repo}/git/refs", headers=headers, json=create_ref_payload, timeout=timeout)
+        r = _SESSION.post(f"{GITHUB_API_BASE}/repos/{owner}/{repo}/git/refs", headers=headers, json=create_ref_payload, timeout=timeout)
         r.raise_for_status()
+        head_sha = base_sha
     elif r.status_code != 200:
         r.raise_for_status()
+    else:
+        head_sha = r.json()["object"]["sha"]
+
+    # Gather changed files using local git. `-z` output is NUL-separated, so paths
+    # containing tabs or newlines survive; they stay bytes until an API call needs them.
+    actions = []
+    cmd = ["git", "-C", git_dir, "diff", "-z", "--name-status", f"{base}..{head}"]
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=_PIPE_BUFSIZE) as proc:
+        fields = _iter_nul_fields(proc.stdout)
+        for status in fields:
+            # Renames and copies (status like 'R100' / 'C075') carry two paths
+            if status[:1] in (b"R", b"C"):
+                old_path, new_path = next(fields, None), next(fields, None)
+                if new_path is None:
+                    break
+                if status[:1] == b"R":
+                    # implement as delete old + add new
+                    actions += [("delete", old_path), ("add", new_path)]
+                else:
+                    actions.append(("add", new_path))
+                continue
 
-    # Gather changed files using local git
-    try:
-        proc = subprocess.run(["git", "-C", git_dir, "diff", "--name-status", f"{base}..{head}"], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        name_status = proc.stdout.decode("utf-8", errors="replace")
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError(f"git diff failed: {e.stderr.decode('utf-8', 'ignore')}")
+            path = next(fields, None)
+            if path is None:
+                break
+            # statuses: A, M, D; others (T, U, ...) are skipped
+            if status in (b"A", b"M"):
+                actions.append(("add", path))
+            elif status == b"D":
+                actions.append(("delete", path))
+        stderr = proc.stderr.read()
+    if proc.returncode != 0:
+        raise RuntimeError(f"git diff failed: {stderr.decode('utf-8', 'ignore')}")
+
+    actions = [(action, raw_path.decode("utf-8", errors="replace")) for action, raw_path in actions]
+    contents_api = f"{GITHUB_API_BASE}/repos/{owner}/{repo}/contents"
+
+    def _remote_sha(path: str) -> Optional[str]:
+        q = _SESSION.get(f"{contents_api}/{path}", headers=headers, params={"ref": head}, timeout=timeout)
+        return q.json().get("sha") if q.status_code == 200 else None
+
+    # Blob SHAs of the touched paths on the target branch. If the commit the
+    # branch points to is in the local object database, one `git ls-tree`
+    # answers all of them (a path it does not list is absent remotely).
+    # Otherwise look them up through the API up front; the lookups are
+    # independent, so they overlap instead of costing one round trip per
+    # file. The writes below stay sequential: each Contents API write is a
+    # commit on `head` and concurrent ones would conflict.
+    paths = list(dict.fromkeys(path for _, path in actions))
+    remote_shas: Dict[str, Optional[str]] = {}
+    local_tree = _ls_tree(git_dir, head_sha) if paths else None
+    if local_tree is not None:
+        remote_shas = {path: local_tree.get(path) for path in paths}
+    elif paths:
+        with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_REQUESTS, len(paths))) as pool:
+            remote_shas = dict(zip(paths, pool.map(_remote_sha, paths)))
 
     ops = []
-    for line in name_status.splitlines():
-        if not line.strip():
-            continue
-        parts = line.split("\t")
-        status = parts[0]
-        # handle rename: status like 'R100'
-        if status.startswith('R'):
-            # rename: parts = [Rxxx, old_path, new_path]
-            if len(parts) >= 3:
-                old_path = parts[1]
-                new_path = parts[2]
-                # implement as delete old + add new
-                actions = [("delete", old_path), ("add", new_path)]
-            else:
-                continue
-        else:
-            # statuses: A, M, D, C etc. We'll support A/M/D
-            if len(parts) < 2:
-                continue
-            path = parts[1]
-            if status == 'A' or status == 'M':
-                actions = [("add", path)]
-            elif status == 'D':
-                actions = [("delete", path)]
+    for action, path in actions:
+        content_url = f"{contents_api}/{path}"
+        sha = remote_shas[path]
+        if action == "delete":
+            if sha is not None:
+                payload = {"message": f"Delete {path}", "branch": head, "sha": sha}
+                resp = _SESSION.delete(content_url, headers=headers, json=payload, timeout=timeout)
+                resp.raise_for_status()
+                ops.append({"op": "delete", "path": path, "response": resp.json()})
+                # A later add of the same path (rename onto a deleted file) must not send a stale sha
+                remote_shas[path] = None
             else:
-                # unknown status: skip
-                continue
+                # file not present remotely; nothing to do
+                ops.append({"op": "delete", "path": path, "response": None})
+        elif action == "add":
+            full_path = os.path.join(git_dir, path)
+            if not os.path.exists(full_path):
+                raise RuntimeError(f"Local file for add/update not found: {full_path}")
+            b64 = _b64_file(full_path)
+
+            # Include the sha when the file already exists on the branch
+            payload = {"message": f"Add/Update {path}", "content": b64, "branch": head}
+            if sha is not None:
+                payload["sha"] = sha
+            resp = _SESSION.put(content_url, headers=headers, json=payload, timeout=timeout)
+            resp.raise_for_status()
+            ops.append({"op": "add_or_update", "path": path, "response": resp.json()})
 
-        for action, path in actions:
-            content_url = f"{GITHUB_API_BASE}/repos/{owner}/{repo}/contents/{path}"
-            if action == "delete":
-                # Need to retrieve the sha of the file on the target branch
-                q = requests.get(content_url, headers=headers, params={"ref": head}, timeout=timeout)
-                if q.status_code == 200:
-                    sha = q.json().get("sha")
-                    payload = {"message": f"Delete {path}", "branch": head, "sha": sha}
-                    resp = requests.delete(content_url, headers=headers, json=payload, timeout=timeout)
-                    resp.raise_for_status()
-                    ops.append({"op": "delete", "path": path, "response": resp.json()})
-                else:
-                    # file not present remotely; nothing to do
-                    ops.append({"op": "delete", "path": path, "response": None})
-            elif action == "add":
-                full_path = os.path.join(git_dir, path)
-                if not os.path.exists(full_path):
-                    raise RuntimeError(f"Local file for add/update not found: {full_path}")
-                # read file bytes and base64 encode
-                with open(full_path, "rb") as fh:
-                    data = fh.read()
-                b64 = base64.b64encode(data).decode("utf-8")
-
-                # Check if file exists on branch to know whether to include sha
-                q = requests.get(content_url, headers=headers, params={"ref": head}, timeout=timeout)
-                payload = {"message": f"Add/Update {path}", "content": b64, "branch": head}
-                if q.status_code == 200:
-                    payload["sha"] = q.json().get("sha")
-                resp = requests.put(content_url, headers=headers, json=payload, timeout=timeout)
-                resp.raise_for_status()
-                ops.append({"op": "add_or_update", "path": path, "response": resp.json()})
+    # Remote refs moved; diffs memoized against them are stale
+    clear_diff_cache()
 
     branch_url = f"https://github.com/{repo_full}/tree/{head}"
     return {"branch_url": branch_url, "operations": ops}
 
 
+_BRANCH_REFS_QUERY = """
+query($owner: String!, $name: String!, $base: String!, $head: String!) {
+  repository(owner: $owner, name: $name) {
+    base: ref(qualifiedName: $base) { target { oid ... on Commit { tree { oid } } } }
+    head: ref(qualifiedName: $head) { target { oid } }
+  }
+}
+"""
+
+
+def _graphql_branch_refs(owner: str, repo: str, base: str, head: str, headers: Dict[str, str], timeout: int) -> Optional[Tuple[str, str, Optional[str]]]:
+    """Return (base commit SHA, base tree SHA, head commit SHA or None) in one GraphQL request.
+
+    Returns None when the query fails or the base branch is not found, so the
+    caller can fall back to the REST endpoints (which also report the error).
+    """
+    variables = {"owner": owner, "name": repo, "base": f"refs/heads/{base}", "head": f"refs/heads/{head}"}
+    try:
+        resp = _SESSION.post(f"{GITHUB_API_BASE}/graphql", headers=headers, json={"query": _BRANCH_REFS_QUERY, "variables": variables}, timeout=timeout)
+        if resp.status_code != 200:
+            return None
+        data = resp.json()
+        repository = (data.get("data") or {}).get("repository")
+        if data.get("errors") or not repository or not repository.get("base"):
+            return None
+        target = repository["base"]["target"]
+        head_ref = repository.get("head")
+        return target["oid"], target["tree"]["oid"], head_ref["target"]["oid"] if head_ref else None
+    except (requests.RequestException, ValueError, KeyError, TypeError):
+        return None
+
+
 def push_tree_via_api(git_dir: str, repo_url: str, base: str, head: str, token: Optional[str] = None, dry_run: bool = False, timeout: int = 10) -> Dict[str, Any]:
-    """Push the working tree in `git_dir` to `head` branch on GitHub using the Git Data and Contents APIs.
+    """Push the working tree in `git_dir` to `head` branch on GitHub using the Git Data API.
 
     Behavior:
     - Uses the Git Trees API to list files in the `base` branch on the remote.
     - Walks the local `git_dir` working tree (skips .git) and computes git blob SHA for each file.
-    - Adds/updates files whose blob SHA differs, and deletes remote files not present locally.
-    - Creates the head branch ref from base if it does not exist.
+    - Uploads a blob for each file whose blob SHA differs, then builds a single
+      tree (on top of the base tree, with remote-only files removed) and a single
+      commit, and points the head branch at it.
+    - Creates the head branch ref if it does not exist.
 
     Returns a dict with 'branch_url' and 'operations'. If `dry_run` is True, no mutating API calls are made; operations describe the planned actions.
     """
-    token = token or os.getenv("GITHUB_TOKEN")
-    if not token:
-        raise ValueError("GITHUB_TOKEN must be set in environment or passed as token")
+    token = _resolve_token(token)
 
     repo_full = parse_repo_full_name(repo_url)
     owner, repo = repo_full.split("/", 1)
-    headers = {"Authorization": f"Bearer {token}", "Accept": "application/vnd.github+json"}
+    headers = {"Authorization": f"Bearer {token}"}
 
-    # Get base commit SHA and tree SHA
-    ref_url = f"{GITHUB_API_BASE}/repos/{owner}/{repo}/git/ref/heads/{base}"
-    r = requests.get(ref_url, headers=headers, timeout=timeout)
-    if r.status_code != 200:
-        raise RuntimeError(f"Failed to get base ref {base}: {r.status_code} {r.text}")
-    base_commit_sha = r.json()["object"]["sha"]
-
-    commit_resp = requests.get(f"{GITHUB_API_BASE}/repos/{owner}/{repo}/git/commits/{base_commit_sha}", headers=headers, timeout=timeout)
-    commit_resp.raise_for_status()
-    base_tree_sha = commit_resp.json()["tree"]["sha"]
+    # Get base commit SHA, base tree SHA and head commit SHA (None if the branch is missing):
+    # one GraphQL query, or three REST calls when GraphQL is unavailable
+    refs = _graphql_branch_refs(owner, repo, base, head, headers, timeout)
+    if refs is not None:
+        base_commit_sha, base_tree_sha, head_commit_sha = refs
+    else:
+        ref_url = f"{GITHUB_API_BASE}/repos/{owner}/{repo}/git/ref/heads/{base}"
+        r = _SESSION.get(ref_url, headers=headers, timeout=timeout)
+        if r.status_code != 200:
+            raise RuntimeError(f"Failed to get base ref {base}: {r.status_code} {r.text}")
+        base_commit_sha = r.json()["object"]["sha"]
+
+        commit_resp = _SESSION.get(f"{GITHUB_API_BASE}/repos/{owner}/{repo}/git/commits/{base_commit_sha}", headers=headers, timeout=timeout)
+        commit_resp.raise_for_status()
+        base_tree_sha = commit_resp.json()["tree"]["sha"]
+
+        head_ref_url = f"{GITHUB_API_BASE}/repos/{owner}/{repo}/git/ref/heads/{head}"
+        r = _SESSION.get(head_ref_url, headers=headers, timeout=timeout)
+        if r.status_code == 404:
+            head_commit_sha = None
+        else:
+            r.raise_for_status()
+            head_commit_sha = r.json()["object"]["sha"]
 
     # Get remote tree recursively
-    tree_resp = requests.get(f"{GITHUB_API_BASE}/repos/{owner}/{repo}/git/trees/{base_tree_sha}", headers=headers, params={"recursive": "1"}, timeout=timeout)
+    tree_resp = _SESSION.get(f"{GITHUB_API_BASE}/repos/{owner}/{repo}/git/trees/{base_tree_sha}", headers=headers, params={"recursive": "1"}, timeout=timeout)
     tree_resp.raise_for_status()
-    remote_entries = tree_resp.json().get("tree", [])
+    # Recursive trees of large repositories are big; parse them with the fast decoder
+    remote_entries = _loads(tree_resp.content).get("tree", [])
     remote_map = {e["path"]: e["sha"] for e in remote_entries if e["type"] == "blob"}
+    remote_modes = {e["path"]: e.get("mode", "100644") for e in remote_entries if e["type"] == "blob"}
 
-    # Build local file map (path -> blob_sha)
-    local_map = {}
+    # Build local file map (path -> blob_sha); file contents are not kept in memory
+    rel_paths = []
+    full_paths = []
     for root, dirs, files in os.walk(git_dir):
-        # skip .git
-        dirs[:] = [d for d in dirs if d != ".git"]
-        for fname in files:
+        # skip .git; symlinks to directories are committed as links, not walked
+        links = [d for d in dirs if os.path.islink(os.path.join(root, d))]
+        dirs[:] = [d for d in dirs if d != ".git" and d not in links]
+        for fname in files + links:
             full = os.path.join(root, fname)
-            rel = os.path.relpath(full, git_dir).replace(os.path.sep, "/")
-            # read bytes and compute git blob sha
-            with open(full, "rb") as fh:
-                data = fh.read()
-            header = f"blob {len(data)}\0".encode("utf-8")
-            sha = hashlib.sha1(header + data).hexdigest()
-            local_map[rel] = {"sha": sha, "bytes": data}
-
-    # Determine operations
-    adds = []
-    updates = []
-    deletes = []
-    for path, info in local_map.items():
-        if path not in remote_map:
-            adds.append(path)
-        elif remote_map[path] != info["sha"]:
-            updates.append(path)
-
-    for path in remote_map:
-        if path not in local_map:
-            deletes.append(path)
+            full_paths.append(full)
+            rel_paths.append(os.path.relpath(full, git_dir).replace(os.path.sep, "/"))
+
+    # File reads and SHA-1 updates release the GIL, so hashing overlaps well in threads
+    with ThreadPoolExecutor(max_workers=_HASH_WORKERS) as pool:
+        local_map = dict(zip(rel_paths, pool.map(_blob_sha, full_paths)))
+    # Modes come from the local files (symlink, executable or regular), so a
+    # chmod or a file replaced by a link is pushed as well
+    local_modes = dict(zip(rel_paths, map(_local_mode, full_paths)))
+
+    # Determine operations with set algebra on the key views (sorted for a stable order)
+    local_paths = local_map.keys()
+    remote_paths = remote_map.keys()
+    adds = sorted(local_paths - remote_paths)
+    deletes = sorted(remote_paths - local_paths)
+    updates = sorted(
+        p for p in local_paths & remote_paths
+        if local_map[p] != remote_map[p] or local_modes[p] != remote_modes[p]
+    )
 
     ops = []
 
-    # Ensure head ref exists (create from base if missing)
-    head_ref_url = f"{GITHUB_API_BASE}/repos/{owner}/{repo}/git/ref/heads/{head}"
-    r = requests.get(head_ref_url, headers=headers, timeout=timeout)
-    if r.status_code == 404:
-        if dry_run:
+    if dry_run:
+        if head_commit_sha is None:
             ops.append({"op": "create_ref", "ref": head, "from": base_commit_sha})
-        else:
-            create_ref_payload = {"ref": f"refs/heads/{head}", "sha": base_commit_sha}
-            rr = requests.post(f"{GITHUB_API_BASE}/repos/{owner}/{repo}/git/refs", headers=headers, json=create_ref_payload, timeout=timeout)
-            rr.raise_for_status()
-            ops.append({"op": "create_ref", "ref": head, "response": rr.json()})
-
-    # Apply adds/updates
-    for path in adds + updates:
-        full = os.path.join(git_dir, path)
-        data = local_map[path]["bytes"]
-        b64 = base64.b64encode(data).decode("utf-8")
-        content_url = f"{GITHUB_API_BASE}/repos/{owner}/{repo}/contents/{path}"
-        payload = {"message": f"Add/Update {path}", "content": b64, "branch": head}
-        if path in remote_map:
-            payload["sha"] = remote_map[path]
-        if dry_run:
+        for path in adds + updates:
+            full = os.path.join(git_dir, path)
+            if local_modes[path] == "120000":
+                content = base64.b64encode(_link_target(full)).decode("ascii")
+            else:
+                content = _b64_file(full)
+            payload = {"message": f"Add/Update {path}", "content": content, "branch": head}
+            if path in remote_map:
+                payload["sha"] = remote_map[path]
             ops.append({"op": "add_or_update", "path": path, "payload": payload})
-        else:
-            resp = requests.put(content_url, headers=headers, json=payload, timeout=timeout)
+        for path in deletes:
+            ops.append({"op": "delete", "path": path, "payload": {"message": f"Delete {path}", "branch": head, "sha": remote_map[path]}})
+        branch_url = f"https://github.com/{repo_full}/tree/{head}"
+        return {"branch_url": branch_url, "operations": ops}
+
+    api = f"{GITHUB_API_BASE}/repos/{owner}/{repo}/git"
+    new_commit_sha = head_commit_sha or base_commit_sha
+    # Write payloads (base64 blobs, whole trees) are serialized with _dumps
+    json_headers = {**headers, "Content-Type": "application/json"}
+
+    if adds or updates or deletes:
+        def upload_blob(path: str) -> str:
+            full = os.path.join(git_dir, path)
+            if local_modes[path] == "120000":
+                payload = _blob_payload(_link_target(full))
+            else:
+                with _file_view(full) as data:
+                    payload = _blob_payload(data)
+            resp = _SESSION.post(f"{api}/blobs", headers=json_headers, data=_dumps(payload), timeout=timeout)
             resp.raise_for_status()
-            ops.append({"op": "add_or_update", "path": path, "response": resp.json()})
+            return resp.json()["sha"]
+
+        changed = adds + updates
+        # Upload each distinct content once; blobs the base tree already holds
+        # (moved or copied files) are referenced without uploading them again
+        path_by_sha: Dict[str, str] = {}
+        for path in changed:
+            path_by_sha.setdefault(local_map[path], path)
+        known = set(remote_map.values())
+        pending = [sha for sha in path_by_sha if sha not in known]
+
+        # Blob uploads are independent, so overlap them in a bounded pool
+        uploaded: Dict[str, str] = {}
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_REQUESTS, len(pending))) as pool:
+                uploaded = dict(zip(pending, pool.map(upload_blob, [path_by_sha[sha] for sha in pending])))
+        blob_shas = [uploaded.get(local_map[path], local_map[path]) for path in changed]
+
+        tree = []
+        for path, blob_sha in zip(changed, blob_shas):
+            tree.append({"path": path, "mode": local_modes[path], "type": "blob", "sha": blob_sha})
+            ops.append({"op": "add_or_update", "path": path, "sha": blob_sha})
+
+        # A null sha removes the path from the base tree
+        for path in deletes:
+            tree.append({"path": path, "mode": remote_modes[path], "type": "blob", "sha": None})
+            ops.append({"op": "delete", "path": path})
+
+        resp = _SESSION.post(f"{api}/trees", headers=json_headers, data=_dumps({"base_tree": base_tree_sha, "tree": tree}), timeout=timeout)
+        resp.raise_for_status()
+        new_tree_sha = resp.json()["sha"]
 
-    # Apply deletes
-    for path in deletes:
-        content_url = f"{GITHUB_API_BASE}/repos/{owner}/{repo}/contents/{path}"
-        sha = remote_map.get(path)
-        payload = {"message": f"Delete {path}", "branch": head, "sha": sha}
-        if dry_run:
-            ops.append({"op": "delete", "path": path, "payload": payload})
-        else:
-            resp = requests.delete(content_url, headers=headers, json=payload, timeout=timeout)
-            # if file missing, ignore
-            if resp.status_code not in (200, 204):
-                resp.raise_for_status()
-            ops.append({"op": "delete", "path": path, "response": resp.json() if resp.content else None})
+        commit_payload = {"message": f"Update {head} from local working tree", "tree": new_tree_sha, "parents": [new_commit_sha]}
+        resp = _SESSION.post(f"{api}/commits", headers=json_headers, data=_dumps(commit_payload), timeout=timeout)
+        resp.raise_for_status()
+        new_commit_sha = resp.json()["sha"]
+        ops.append({"op": "commit", "sha": new_commit_sha})
+
+    # Point the head branch at the new commit, creating it if missing
+    if head_commit_sha is None:
+        rr = _SESSION.post(f"{api}/refs", headers=json_headers, data=_dumps({"ref": f"refs/heads/{head}", "sha": new_commit_sha}), timeout=timeout)
+        rr.raise_for_status()
+        ops.append({"op": "create_ref", "ref": head, "response": rr.json()})
+    elif new_commit_sha != head_commit_sha:
+        rr = _SESSION.patch(f"{api}/refs/heads/{head}", headers=json_headers, data=_dumps({"sha": new_commit_sha}), timeout=timeout)
+        rr.raise_for_status()
+        ops.append({"op": "update_ref", "ref": head, "response": rr.json()})
+
+    clear_diff_cache()
 
     branch_url = f"https://github.com/{repo_full}/tree/{head}"
     return {"branch_url": branch_url, "operations": ops}
@@ -4,9 +4,42 @@ Provides a helper to load a system prompt from a file and substitute
 environment-variable placeholders in the form {{VARNAME}}.
 """
 
+import functools
 import os
 import re
-from typing import Match
+
+# Placeholder syntax inside the prompt file: {{VARNAME}}. The template is
+# matched after literal braces were doubled, so a placeholder reads {{{{VARNAME}}}}.
+_PLACEHOLDER_RE = re.compile(r"\{\{\{\{([A-Z0-9_]+)\}\}\}\}")
+
+
+class _EnvMap(dict):
+    """Mapping for str.format_map that resolves `_VARNAME` keys from the environment."""
+
+    def __missing__(self, key: str) -> str:
+        var = key[1:]
+        val = os.environ.get(var)
+        if val is None:
+            raise ValueError(f"Environment variable '{var}' referenced in SYSTEM_PROMPT_FILE is not set")
+        return val
+
+
+@functools.lru_cache(maxsize=16)
+def _read_prompt_file(path: str, mtime_ns: int, size: int) -> str:
+    """Return the contents of `path`; cached per file version (mtime and size)."""
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+@functools.lru_cache(maxsize=16)
+def _to_format_template(text: str) -> str:
+    """Turn prompt text into a str.format template: {{VAR}} -> {_VAR}, other braces escaped.
+
+    The leading underscore keeps names such as {{0}} from being parsed as
+    positional fields.
+    """
+    escaped = text.replace("{", "{{").replace("}", "}}")
+    return _PLACEHOLDER_RE.sub(r"{_\1}", escaped)
 
 
 def load_system_prompt() -> str:
@@ -16,27 +49,22 @@ def load_system_prompt() -> str:
     the corresponding environment variable. If SYSTEM_PROMPT_FILE is not set
     or the file can't be read, or a referenced env var is missing, a
     ValueError is raised.
+
+    The file is only re-read when its modification time or size changes;
+    placeholders are substituted on every call.
     """
     env_path = os.getenv("SYSTEM_PROMPT_FILE")
     if not env_path:
         raise ValueError("SYSTEM_PROMPT_FILE environment variable was not set")
 
     try:
-        with open(env_path, "r", encoding="utf-8") as f:
-            text = f.read()
+        st = os.stat(env_path)
+        text = _read_prompt_file(env_path, st.st_mtime_ns, st.st_size)
     except FileNotFoundError:
         raise ValueError(f"SYSTEM_PROMPT_FILE is set to '{env_path}' but the file was not found")
 
-    pattern = re.compile(r"\{\{([A-Z0-9_]+)\}\}")
-
-    def _replace(match: Match[str]) -> str:
-        var = match.group(1)
-        val = os.getenv(var)
-        if val is None:
-            raise ValueError(f"Environment variable '{var}' referenced in SYSTEM_PROMPT_FILE is not set")
-        return val
-
-    return pattern.sub(_replace, text)
+    # One C-level formatting pass; missing variables raise from _EnvMap
+    return _to_format_template(text).format_map(_EnvMap())
 
 
 __all__ = ["load_system_prompt"]
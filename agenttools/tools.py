@@ -1,9 +1,15 @@
 """File access tools for AI agents."""
 
+import io
 import os
+import stat
 from typing import Optional
 from langchain.tools import tool
 
+# Buffer size for write_file; larger than the st_blksize default so big
+# contents are flushed in fewer write() calls
+_WRITE_BUFFER = max(io.DEFAULT_BUFFER_SIZE, 128 * 1024)
+
 
 @tool
 def read_file(file_path: str) -> str:
@@ -44,7 +50,7 @@ def write_file(file_path: str, content: str) -> str:
         if dir_name:
             os.makedirs(dir_name, exist_ok=True)
 
-        with open(file_path, 'w', encoding='utf-8') as f:
+        with open(file_path, 'w', encoding='utf-8', buffering=_WRITE_BUFFER) as f:
             f.write(content)
         return f"Successfully wrote to {file_path}"
     except Exception as e:
@@ -62,20 +68,21 @@ def list_directory(directory_path: str) -> str:
         A string containing the list of files and directories
     """
     try:
-        entries = os.listdir(directory_path)
-        if not entries:
-            return f"Directory {directory_path} is empty"
-        
         files = []
         dirs = []
-        for entry in entries:
-            full_path = os.path.join(directory_path, entry)
-            if os.path.isdir(full_path):
-                dirs.append(f"[DIR]  {entry}")
-            else:
-                size = os.path.getsize(full_path)
-                files.append(f"[FILE] {entry} ({size} bytes)")
-        
+        # scandir reports the entry type from the directory listing itself, so
+        # only files need a stat call (for their size); symlinks are followed
+        # as with os.path.isdir/getsize
+        with os.scandir(directory_path) as it:
+            for entry in it:
+                if entry.is_dir():
+                    dirs.append(f"[DIR]  {entry.name}")
+                else:
+                    files.append(f"[FILE] {entry.name} ({entry.stat().st_size} bytes)")
+
+        if not dirs and not files:
+            return f"Directory {directory_path} is empty"
+
         result = f"Contents of {directory_path}:\n"
         if dirs:
             result += "\nDirectories:\n" + "\n".join(sorted(dirs))
@@ -99,18 +106,20 @@ def file_exists(file_path: str) -> str:
     Returns:
         A message indicating whether the file/directory exists
     """
-    exists = os.path.exists(file_path)
-    if exists:
-        if os.path.isfile(file_path):
-            size = os.path.getsize(file_path)
-            return f"File exists at {file_path} ({size} bytes)"
-        elif os.path.isdir(file_path):
-            return f"Directory exists at {file_path}"
-        else:
-            return f"Path exists at {file_path} (special file)"
-    else:
+    # One stat call answers existence, type and size
+    try:
+        st = os.stat(file_path)
+    except (OSError, ValueError):
+        # same cases in which os.path.exists reports False
         return f"Path does not exist: {file_path}"
 
+    if stat.S_ISREG(st.st_mode):
+        return f"File exists at {file_path} ({st.st_size} bytes)"
+    elif stat.S_ISDIR(st.st_mode):
+        return f"Directory exists at {file_path}"
+    else:
+        return f"Path exists at {file_path} (special file)"
+
 
 def get_file_tools():
     """Get a list of all file access tools.
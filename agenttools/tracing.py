@@ -7,16 +7,30 @@ variable `AGENT_LOG`.
 
 from __future__ import annotations
 
+import atexit
+import json
 import os
-import pprint
-from typing import Any
-from datetime import datetime, timezone
+import threading
+import time
+from typing import Any, Optional, TextIO, Tuple
 
 # Log file name used by trace_print. Default to 'agent_log.txt' when AGENT_LOG is not set.
 AGENT_LOG_FILE = os.environ.get("AGENT_LOG") or "agent_log.txt"
 
+# Directory a relative AGENT_LOG_FILE is resolved against; pinned to the
+# working directory at the first trace_print unless set_log_dir was called.
+_LOG_DIR: Optional[str] = None
+
 _SILENT = False
 
+# log_response output is cut after this many characters
+_MAX_LOGGED_CHARS = 16384
+
+# Log file handle kept open between trace_print calls; guarded by _LOG_LOCK
+_LOG_LOCK = threading.Lock()
+_LOG_FH: Optional[TextIO] = None
+_LOG_FH_PATH: Optional[str] = None
+
 
 def set_silent(silent: bool) -> None:
     """Set tracer silent mode.
@@ -28,7 +42,67 @@ def set_silent(silent: bool) -> None:
     _SILENT = bool(silent)
 
 
+def set_log_dir(path: str) -> None:
+    """Resolve a relative log file name against `path` from now on.
+
+    By default the log lives in the working directory at the time of the
+    first trace_print call; a later os.chdir does not move it.
+    """
+    global _LOG_DIR
+    _LOG_DIR = os.path.abspath(path)
+
+
+def is_silent() -> bool:
+    """Return True when console output is suppressed."""
+    return _SILENT
+
+
+def _log_handle(path: str) -> TextIO:
+    """Return the open log file for `path`, (re)opening it when the path changes.
+
+    The handle is line-buffered so every traced line reaches the file right
+    away; the wrapper scripts append to the same AGENT_LOG file.
+    """
+    global _LOG_FH, _LOG_FH_PATH
+    if _LOG_FH is None or _LOG_FH_PATH != path:
+        if _LOG_FH is not None:
+            _LOG_FH.close()
+        _LOG_FH = open(path, "a", encoding="utf-8", buffering=1)
+        _LOG_FH_PATH = path
+    return _LOG_FH
+
+
+def _close_log() -> None:
+    global _LOG_FH, _LOG_FH_PATH
+    with _LOG_LOCK:
+        if _LOG_FH is not None:
+            _LOG_FH.close()
+        _LOG_FH = None
+        _LOG_FH_PATH = None
+
+
+atexit.register(_close_log)
+
+
+# (epoch second, formatted "YYYY-MM-DDTHH:MM:SS") of the last timestamp
+_TS_SECOND: Tuple[int, str] = (-1, "")
+
+
+def _timestamp() -> str:
+    """Return the current UTC time as ISO 8601 with microseconds and a trailing Z."""
+    global _TS_SECOND
+    now = time.time()
+    second = int(now)
+    cached_second, prefix = _TS_SECOND
+    if second != cached_second:
+        # Only format the date/time part once per second
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+        _TS_SECOND = (second, prefix)
+    return f"{prefix}.{int((now - second) * 1_000_000):06d}Z"
+
+
 def trace_print(*args: Any, sep: str = " ", end: str = "\n", flush: bool = False, log_only: bool = False) -> None:
+    global _LOG_DIR
     # Format message like built-in print
     message = sep.join(str(a) for a in args) + end
 
@@ -38,29 +112,37 @@ def trace_print(*args: Any, sep: str = " ", end: str = "\n", flush: bool = False
 
     # Append to log file with timestamp
     try:
-        timestamp = datetime.now(timezone.utc).isoformat()
-        # Normalize UTC ISO format to include a trailing Z instead of +00:00
-        if timestamp.endswith("+00:00"):
-            timestamp = timestamp[:-6] + "Z"
-        log_line = f"[{timestamp}] {message}"
-        log_path = os.path.join(os.getcwd(), AGENT_LOG_FILE)
-        with open(log_path, "a", encoding="utf-8") as f:
-            f.write(log_line)
+        log_line = f"[{_timestamp()}] {message}"
+        with _LOG_LOCK:
+            if _LOG_DIR is None:
+                _LOG_DIR = os.getcwd()
+            log_path = os.path.join(_LOG_DIR, AGENT_LOG_FILE)
+            _log_handle(log_path).write(log_line)
     except Exception:
         # Never raise from the tracer; logging should be best-effort.
         pass
 
+
+def _capped(text: str) -> str:
+    """Return `text` cut to _MAX_LOGGED_CHARS with a truncation marker."""
+    if len(text) > _MAX_LOGGED_CHARS:
+        return text[:_MAX_LOGGED_CHARS] + "...<truncated>"
+    return text
+
+
 def log_response(response: any) -> None:
-    # Debug: print structure when result is a dict (or show repr otherwise)
+    # Debug: log structure when result is a dict (or show repr otherwise),
+    # as a single trace line so it costs one lock/write cycle
     try:
         if isinstance(response, dict):
-            trace_print(f"Result is dict with keys: {list(response.keys())}", log_only=True)
-            trace_print("Result (pprint):", log_only=True)
-            trace_print(pprint.pformat(response), log_only=True)
+            # json.dumps is several times faster than pprint.pformat; output is capped
+            body = _capped(json.dumps(response, indent=2, default=str, ensure_ascii=False))
+            message = f"Result is dict with keys: {list(response.keys())}\nResult (json):\n{body}"
         else:
-            trace_print(f"Result type: {type(response)}", log_only=True)
-            trace_print(repr(response), log_only=True)
+            message = f"Result type: {type(response)}\n{_capped(repr(response))}"
+        trace_print(message, log_only=True)
     except Exception as dbg_err:
         trace_print(f"Failed to print result structure: {dbg_err}", log_only=True)
 
-__all__ = ["trace_print"]
+
+__all__ = ["trace_print", "set_log_dir"]
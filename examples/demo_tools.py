@@ -14,7 +14,8 @@ def demo_file_tools():
     
     # Get all tools
     tools = get_file_tools()
-    print(f"Available tools: {', '.join(t.name for t in tools)}")
+    by_name = {t.name: t for t in tools}
+    print(f"Available tools: {', '.join(by_name)}")
     print()
     
     # Create a temporary directory for demo
@@ -24,7 +25,7 @@ def demo_file_tools():
         print("=" * 60)
         print("1. Writing a file")
         print("=" * 60)
-        write_tool = [t for t in tools if t.name == "write_file"][0]
+        write_tool = by_name["write_file"]
         content = """This is a demo file created by agenttools.
 It demonstrates the file writing capability.
 The agent can create and write to files."""
@@ -35,7 +36,7 @@ The agent can create and write to files."""
         print("=" * 60)
         print("2. Checking if file exists")
         print("=" * 60)
-        exists_tool = [t for t in tools if t.name == "file_exists"][0]
+        exists_tool = by_name["file_exists"]
         result = exists_tool.invoke({"file_path": demo_file})
         print(f"Result: {result}")
         print()
@@ -43,7 +44,7 @@ The agent can create and write to files."""
         print("=" * 60)
         print("3. Reading the file")
         print("=" * 60)
-        read_tool = [t for t in tools if t.name == "read_file"][0]
+        read_tool = by_name["read_file"]
         result = read_tool.invoke({"file_path": demo_file})
         print(f"Content:\n{result}")
         print()
@@ -51,7 +52,7 @@ The agent can create and write to files."""
         print("=" * 60)
         print("4. Listing directory contents")
         print("=" * 60)
-        list_tool = [t for t in tools if t.name == "list_directory"][0]
+        list_tool = by_name["list_directory"]
         result = list_tool.invoke({"directory_path": temp_dir})
         print(result)
         print()
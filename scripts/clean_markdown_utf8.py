@@ -1,36 +1,124 @@
+import codecs
+import io
+import mmap
+import os
+import re
 import sys
 
+# Define replacements: add more as needed
+_REPLACEMENTS = {
+    '\u202f': ' ',   # narrow no-break space
+    '\u00a0': ' ',   # non-breaking space
+    '\u2011': '-',   # non-breaking hyphen
+    '\u2013': '-',   # en dash
+    '\u2014': '-',   # em dash
+    '\u2018': "'",   # left single quote
+    '\u2019': "'",   # right single quote
+    '\u201c': '"',   # left double quote
+    '\u201d': '"',   # right double quote
+    'â€‘': '-',      # mojibake for non-breaking hyphen
+    'â€¯': ' ',      # common mojibake for narrow no-break space
+    'â€“': '-',      # mojibake for en dash
+    'â€”': '-',      # mojibake for em dash
+    'â€˜': "'",      # mojibake for left single quote
+    'â€™': "'",      # mojibake for right single quote
+    'â€œ': '"',      # mojibake for left double quote
+    'â€�': '"',      # mojibake for right double quote
+}
+
+# Single code points are replaced in one str.translate pass; the multi-character
+# mojibake sequences in one regex scan (longest first, so a sequence is never
+# pre-empted by one of its prefixes).
+_TABLE = str.maketrans({k: v for k, v in _REPLACEMENTS.items() if len(k) == 1})
+_MULTI = tuple((k, v) for k, v in _REPLACEMENTS.items() if len(k) > 1)
+_MULTI_MAP = dict(_MULTI)
+_MOJ_RE = re.compile('|'.join(re.escape(k) for k in sorted(_MULTI_MAP, key=len, reverse=True)))
+_MOJ_SUB = _MOJ_RE.sub
+
+
+# Streaming: characters decoded per read, and file buffer sizes
+_CHUNK_CHARS = 1 << 18
+_IO_BUFFER = 1 << 17
+
+# Inputs at least this large are memory-mapped; below it mmap setup costs more
+# than it saves. Mapped input is decoded in slices of _CHUNK_BYTES.
+_MMAP_MIN_SIZE = 64 * 1024
+_CHUNK_BYTES = 1 << 18
+
+# Proper prefixes of the mojibake sequences; a chunk ending in one of them is
+# carried over so a sequence split across two reads still matches
+_MULTI_PREFIXES = frozenset(k[:i] for k, _ in _MULTI for i in range(1, len(k)))
+_MAX_CARRY = max(len(k) for k, _ in _MULTI) - 1
+
+
+def _moj_replacement(match):
+    return _MULTI_MAP[match.group()]
+
+
+def _replace_multi(text):
+    # Mojibake first: some sequences end in a curly quote (e.g. 'â€‘' ends in
+    # '‘') that the translate pass would otherwise rewrite before they match
+    return _MOJ_SUB(_moj_replacement, text)
+
+
+def _carry_len(text):
+    """Length of the longest suffix of `text` that may start a mojibake sequence."""
+    for n in range(min(_MAX_CARRY, len(text)), 0, -1):
+        if text[-n:] in _MULTI_PREFIXES:
+            return n
+    return 0
+
+
+def _iter_text(f_in):
+    """Yield the decoded text of binary file `f_in` in chunks.
+
+    Decodes like open(..., 'r', encoding='utf-8', errors='replace'), including
+    universal newline translation.
+    """
+    size = os.fstat(f_in.fileno()).st_size
+    if size < _MMAP_MIN_SIZE:
+        text_in = io.TextIOWrapper(f_in, encoding='utf-8', errors='replace')
+        while True:
+            chunk = text_in.read(_CHUNK_CHARS)
+            if not chunk:
+                return
+            yield chunk
+
+    # Decode straight from the page cache through a memoryview, without first
+    # copying the bytes into a read buffer
+    decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder('utf-8')('replace'), translate=True)
+    with mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+        for start in range(0, size, _CHUNK_BYTES):
+            chunk = decoder.decode(view[start:start + _CHUNK_BYTES])
+            if chunk:
+                yield chunk
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
 def clean_markdown_utf8(input_file, output_file):
-    # Define replacements: add more as needed
-    replacements = {
-        '\u202f': ' ',   # narrow no-break space
-        '\u00a0': ' ',   # non-breaking space
-        '\u2011': '-',   # non-breaking hyphen
-        '\u2013': '-',   # en dash
-        '\u2014': '-',   # em dash
-        '\u2018': "'",   # left single quote
-        '\u2019': "'",   # right single quote
-        '\u201c': '"',   # left double quote
-        '\u201d': '"',   # right double quote
-        'â€‘': '-',      # mojibake for non-breaking hyphen
-        'â€¯': ' ',      # common mojibake for narrow no-break space
-        'â€“': '-',      # mojibake for en dash
-        'â€”': '-',      # mojibake for em dash
-        'â€˜': "'",      # mojibake for left single quote
-        'â€™': "'",      # mojibake for right single quote
-        'â€œ': '"',      # mojibake for left double quote
-        'â€�': '"',      # mojibake for right double quote
-    }
-
-    with open(input_file, 'r', encoding='utf-8', errors='replace') as f:
-        content = f.read()
-    for bad, good in replacements.items():
-        content = content.replace(bad, good)
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(content)
+    if os.path.exists(output_file) and os.path.samefile(input_file, output_file):
+        # Cleaning in place: the whole input must be read before it is overwritten
+        with open(input_file, 'r', encoding='utf-8', errors='replace') as f:
+            content = f.read()
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(_replace_multi(content).translate(_TABLE))
+        return
+
+    # Stream in fixed-size chunks so memory stays O(chunk) and reads overlap with work
+    with open(input_file, 'rb', buffering=_IO_BUFFER) as f_in, \
+            open(output_file, 'w', encoding='utf-8', buffering=_IO_BUFFER) as f_out:
+        pending = ''
+        for chunk in _iter_text(f_in):
+            text = _replace_multi(pending + chunk)
+            keep = _carry_len(text)
+            pending = text[len(text) - keep:]
+            f_out.write(text[:len(text) - keep].translate(_TABLE))
+        f_out.write(pending.translate(_TABLE))
 
 if __name__ == '__main__':
     if len(sys.argv) != 3:
         print("Usage: python clean_markdown_utf8.py input.md output.md")
         sys.exit(1)
-    clean_markdown_utf8(sys.argv[1], sys.argv[2])
\ No newline at end of file
+    clean_markdown_utf8(sys.argv[1], sys.argv[2])
@@ -12,6 +12,7 @@ Examples:
 import os
 import sys
 import argparse
+import mmap
 from pathlib import Path
 from typing import Optional
 import subprocess
@@ -23,6 +24,25 @@ if str(repo_root) not in sys.path:
 
 from agenttools.github_pr import get_git_diff, parse_repo_full_name, create_pull_request, create_pr_from_git, push_branch_via_api, push_tree_via_api
 
+# Body files at least this large are memory-mapped; below it mmap setup costs
+# more than it saves
+_MMAP_MIN_SIZE = 64 * 1024
+
+
+def read_body_file(path: str) -> str:
+    """Return the UTF-8 contents of `path`, decoding large files straight from a mapping.
+
+    Line endings are normalized to '\\n' like a text-mode read, so CRLF body
+    files are not posted with carriage returns.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < _MMAP_MIN_SIZE:
+            text = f.read().decode("utf-8")
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                text = str(mm, "utf-8")
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
 
 def main(argv=None):
     parser = argparse.ArgumentParser(description="Create GitHub PR from local git branch (API-only)")
@@ -43,7 +63,7 @@ def main(argv=None):
 
     body = args.body
     if args.body_file:
-        body = Path(args.body_file).read_text(encoding="utf-8")
+        body = read_body_file(args.body_file)
 
     repo_full_name = parse_repo_full_name(args.repo)
 
@@ -71,7 +91,8 @@ def main(argv=None):
         ops = api_push_res.get("operations") or []
         summary_lines = []
         for op in ops:
-            summary_lines.append(f"{op.get('op')}: {op.get('path', op.get('ref', ''))}")
+            # file ops carry a path, ref ops a ref and the commit op only its sha
+            summary_lines.append(f"{op.get('op')}: {op.get('path') or op.get('ref') or op.get('sha', '')}")
         pr_body = "Automated PR (API push)\n\nChanges:\n" + "\n".join(summary_lines)
 
     res = create_pull_request(repo_full_name, args.head, base=args.base, title=args.title, body=pr_body, token=token, dry_run=args.dry_run)
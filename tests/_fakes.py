@@ -0,0 +1,30 @@
+"""Test doubles shared by the GitHub PR test modules."""
+
+import io
+
+
+class FakePopen:
+    """Minimal stand-in for subprocess.Popen serving canned stdout."""
+
+    def __init__(self, cmd, output=b"", returncode=0):
+        self.args = cmd
+        self.stdout = io.BytesIO(output)
+        self.stderr = io.BytesIO(b"")
+        self.returncode = None
+        self.killed = False
+        self._returncode = returncode
+
+    def kill(self):
+        self.killed = True
+
+    def wait(self):
+        self.returncode = self._returncode
+        return self.returncode
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stdout.close()
+        self.stderr.close()
+        self.wait()
@@ -0,0 +1,272 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
+
+from agenttools.agent import FileAgent
+
+
+class FakeExecutor:
+    """Stand-in for the compiled agent graph that echoes the user query."""
+
+    def __init__(self):
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def invoke(self, inputs):
+        self.calls += 1
+        query = inputs["messages"][-1]["content"]
+        return {"messages": [AIMessage(content=f"echo: {query}")]}
+
+    async def ainvoke(self, inputs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return self.invoke(inputs)
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    f = tmp_path / "sys_prompt.txt"
+    f.write_text("You are a test agent", encoding="utf-8")
+    monkeypatch.setenv("SYSTEM_PROMPT_FILE", str(f))
+    monkeypatch.setenv("AGENT_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.delenv("OLLAMA_NUM_PARALLEL", raising=False)
+
+    agent = FileAgent(provider="ollama", response_file=str(tmp_path / "responses.txt"))
+    agent.agent_executor = FakeExecutor()
+    return agent
+
+
+def test_run_batch_preserves_order(agent):
+    responses = agent.run_batch(["one", "two", "three"])
+    assert responses == ["echo: one", "echo: two", "echo: three"]
+    assert agent.agent_executor.max_in_flight == 3
+
+
+def test_responses_appended_to_response_file(agent):
+    agent.run("one")
+    agent.run("two")
+    agent.close()
+    agent.close()
+    with open(agent.response_file, encoding="utf-8") as f:
+        assert f.read() == "echo: one\necho: two\n"
+
+
+def test_run_batch_records_responses_in_input_order(agent):
+    class Staggered(FakeExecutor):
+        async def ainvoke(self, inputs):
+            # Later queries finish first
+            query = inputs["messages"][-1]["content"]
+            await asyncio.sleep(0.03 - 0.01 * int(query))
+            if query == "1":
+                raise RuntimeError("boom")
+            return self.invoke(inputs)
+
+    agent.agent_executor = Staggered()
+    agent.run_batch(["0", "1", "2"])
+    agent.close()
+    with open(agent.response_file, encoding="utf-8") as f:
+        assert f.read().splitlines() == ["echo: 0", "Error executing agent: boom", "echo: 2"]
+
+
+def test_run_batch_respects_max_concurrency(agent):
+    agent.max_concurrency = 2
+    responses = agent.run_batch([str(i) for i in range(5)])
+    assert responses == [f"echo: {i}" for i in range(5)]
+    assert agent.agent_executor.max_in_flight == 2
+
+
+class LoopBoundExecutor(FakeExecutor):
+    """Fake model client whose connections belong to the loop of its first call."""
+
+    def __init__(self):
+        super().__init__()
+        self.loop = None
+
+    async def ainvoke(self, inputs):
+        loop = asyncio.get_running_loop()
+        if self.loop is None:
+            self.loop = loop
+        if loop is not self.loop or self.loop.is_closed():
+            raise RuntimeError("Event loop is closed")
+        return self.invoke(inputs)
+
+
+def test_run_batch_reuses_event_loop(agent):
+    agent.agent_executor = LoopBoundExecutor()
+    assert agent.run_batch(["one"]) == ["echo: one"]
+    assert agent.run_batch(["two", "three"]) == ["echo: two", "echo: three"]
+    agent.close()
+
+
+def test_run_uses_cache_only_when_deterministic(tmp_path, monkeypatch):
+    f = tmp_path / "sys_prompt.txt"
+    f.write_text("You are a test agent", encoding="utf-8")
+    monkeypatch.setenv("SYSTEM_PROMPT_FILE", str(f))
+    monkeypatch.setenv("AGENT_CACHE_DIR", str(tmp_path / "cache"))
+
+    sampled = FileAgent(provider="ollama", response_file=str(tmp_path / "responses.txt"))
+    sampled.agent_executor = FakeExecutor()
+    sampled.run("hello")
+    sampled.run("hello")
+    assert sampled.agent_executor.calls == 2
+
+    first = FileAgent(provider="ollama", temperature=0, response_file=str(tmp_path / "responses.txt"))
+    first.agent_executor = FakeExecutor()
+    assert first.run("hello") == "echo: hello"
+
+    # A new agent with the same settings is served from the on-disk cache
+    second = FileAgent(provider="ollama", temperature=0, response_file=str(tmp_path / "responses.txt"))
+    second.agent_executor = FakeExecutor()
+    assert second.run("hello") == "echo: hello"
+    assert second.agent_executor.calls == 0
+    assert second.run("other") == "echo: other"
+    assert second.agent_executor.calls == 1
+
+    no_cache = FileAgent(provider="ollama", temperature=0, cache=False, response_file=str(tmp_path / "responses.txt"))
+    no_cache.agent_executor = FakeExecutor()
+    no_cache.run("hello")
+    assert no_cache.agent_executor.calls == 1
+
+
+def test_ollama_connection_error_mentions_base_url(agent):
+    class Refusing(FakeExecutor):
+        def invoke(self, inputs):
+            raise RuntimeError("[Errno 111] Connection refused")
+
+    agent.agent_executor = Refusing()
+    out = agent.run("hello")
+    assert out.startswith("Error executing agent: cannot connect to Ollama at")
+    assert agent.base_url in out
+
+
+def test_failed_query_does_not_keep_semantic_embedding(agent):
+    from agenttools.cache import SemanticCache
+
+    class Embeddings:
+        def embed_query(self, text):
+            return [1.0, 0.0]
+
+    class Failing(FakeExecutor):
+        def invoke(self, inputs):
+            raise RuntimeError("boom")
+
+    agent._semantic_cache = SemanticCache(Embeddings())
+    agent.agent_executor = Failing()
+    assert agent.run("hello").startswith("Error executing agent")
+    assert agent._semantic_cache._pending == {}
+
+
+def test_chat_stream_streams_final_answer(agent, monkeypatch, capsys):
+    class Streaming(FakeExecutor):
+        async def astream(self, inputs, stream_mode=None):
+            assert stream_mode == "messages"
+            for chunk in (
+                AIMessageChunk(content="", id="call"),
+                ToolMessage(content="a.txt", tool_call_id="t1"),
+                AIMessageChunk(content="hel", id="final"),
+                AIMessageChunk(content="lo", id="final"),
+            ):
+                yield chunk, {}
+
+    agent.agent_executor = Streaming()
+    answers = iter(["hi", "exit"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+
+    agent.chat_stream()
+
+    assert "Agent: hello" in capsys.readouterr().out
+    with open(agent.response_file, encoding="utf-8") as f:
+        assert f.read() == "hello\n"
+
+
+def test_chat_stream_keeps_one_event_loop(agent, monkeypatch, capsys):
+    class Streaming(LoopBoundExecutor):
+        async def astream(self, inputs, stream_mode=None):
+            await self.ainvoke(inputs)
+            yield AIMessageChunk(content=inputs["messages"][-1]["content"], id="final"), {}
+
+    agent.agent_executor = Streaming()
+    answers = iter(["first", "second", "exit"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+
+    agent.chat_stream()
+
+    out = capsys.readouterr().out
+    assert "Agent: first" in out and "Agent: second" in out
+    assert "Error" not in out
+
+
+def test_chat_stream_exits_on_single_ctrl_c(agent, monkeypatch, capsys):
+    class Interrupted(FakeExecutor):
+        async def astream(self, inputs, stream_mode=None):
+            raise KeyboardInterrupt
+            yield
+
+    # Ctrl-C while an answer streams, then Ctrl-C at the prompt
+    agent.agent_executor = Interrupted()
+    answers = iter(["hi"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+    agent.chat_stream()
+    assert capsys.readouterr().out.count("Goodbye!") == 1
+
+    def interrupt(prompt=""):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr("builtins.input", interrupt)
+    agent.chat_stream()
+    assert "Goodbye!" in capsys.readouterr().out
+
+
+def test_main_returns_cleanly_on_ctrl_c(tmp_path, monkeypatch, capsys):
+    from agenttools import agent as agent_module
+
+    f = tmp_path / "sys_prompt.txt"
+    f.write_text("You are a test agent", encoding="utf-8")
+    monkeypatch.setenv("SYSTEM_PROMPT_FILE", str(f))
+    monkeypatch.setattr("sys.argv", ["agent", "--provider", "ollama", "--model", "llama3"])
+
+    def interrupt(self):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(agent_module.FileAgent, "chat_stream", interrupt)
+    assert agent_module.main() == 130
+    assert "Goodbye!" in capsys.readouterr().out
+
+
+def test_dotenv_loaded_once_per_process(tmp_path, monkeypatch):
+    f = tmp_path / "sys_prompt.txt"
+    f.write_text("You are a test agent", encoding="utf-8")
+    monkeypatch.setenv("SYSTEM_PROMPT_FILE", str(f))
+
+    calls = []
+    monkeypatch.setattr("agenttools.agent.load_dotenv", lambda: calls.append(1))
+    monkeypatch.setattr("agenttools.agent._DOTENV_LOADED", False)
+
+    FileAgent(provider="ollama")
+    FileAgent(provider="ollama")
+    assert len(calls) == 1
+
+
+def test_ollama_warmup_preloads_model(tmp_path, monkeypatch):
+    f = tmp_path / "sys_prompt.txt"
+    f.write_text("You are a test agent", encoding="utf-8")
+    monkeypatch.setenv("SYSTEM_PROMPT_FILE", str(f))
+    monkeypatch.setenv("OLLAMA_KEEP_ALIVE", "30m")
+
+    calls = []
+
+    class FakeClient:
+        def __init__(self, host=None):
+            self.host = host
+
+        def generate(self, **kwargs):
+            calls.append((self.host, kwargs))
+
+    monkeypatch.setattr("ollama.Client", FakeClient)
+
+    agent = FileAgent(provider="ollama", model="granite4:micro-h", warmup=True)
+    assert calls == [(agent.base_url, {"model": "granite4:micro-h", "prompt": "", "keep_alive": "30m"})]
@@ -28,3 +28,46 @@ def test_system_prompt_file_missing_env(tmp_path, monkeypatch):
 
     with pytest.raises(ValueError):
         FileAgent(provider="ollama")
+
+
+def test_load_system_prompt_rereads_modified_file(tmp_path, monkeypatch):
+    from agenttools.system_prompt import load_system_prompt
+
+    f = tmp_path / "sys_prompt3.txt"
+    f.write_text("Version {{VER}}", encoding="utf-8")
+    monkeypatch.setenv("SYSTEM_PROMPT_FILE", str(f))
+    monkeypatch.setenv("VER", "1")
+    assert load_system_prompt() == "Version 1"
+
+    # Placeholders are substituted per call even when the file is cached
+    monkeypatch.setenv("VER", "2")
+    assert load_system_prompt() == "Version 2"
+
+    f.write_text("Changed {{VER}}!", encoding="utf-8")
+    os.utime(f, ns=(0, 10**9))
+    assert load_system_prompt() == "Changed 2!"
+
+
+def test_load_system_prompt_keeps_literal_braces(tmp_path, monkeypatch):
+    from agenttools.system_prompt import load_system_prompt
+
+    f = tmp_path / "sys_prompt4.txt"
+    f.write_text('Reply as {"answer": "..."} using {{TOOL}} and {{{TOOL}}}', encoding="utf-8")
+    monkeypatch.setenv("SYSTEM_PROMPT_FILE", str(f))
+    monkeypatch.setenv("TOOL", "read_file")
+    assert load_system_prompt() == 'Reply as {"answer": "..."} using read_file and {read_file}'
+
+
+def test_load_system_prompt_numeric_placeholder(tmp_path, monkeypatch):
+    from agenttools.system_prompt import load_system_prompt
+
+    f = tmp_path / "sys_prompt5.txt"
+    f.write_text("Step {{0}} of {{1_STEP}}", encoding="utf-8")
+    monkeypatch.setenv("SYSTEM_PROMPT_FILE", str(f))
+    monkeypatch.delenv("0", raising=False)
+    with pytest.raises(ValueError, match="Environment variable '0' referenced"):
+        load_system_prompt()
+
+    monkeypatch.setenv("0", "one")
+    monkeypatch.setenv("1_STEP", "two")
+    assert load_system_prompt() == "Step one of two"
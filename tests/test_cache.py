@@ -0,0 +1,64 @@
+import time
+
+from agenttools.cache import ResponseCache, SemanticCache
+
+
+def test_make_key_is_stable_and_distinct():
+    key = ResponseCache.make_key("ollama", "model", "prompt", "query", 0)
+    assert key == ResponseCache.make_key("ollama", "model", "prompt", "query", 0)
+    assert key != ResponseCache.make_key("ollama", "model", "prompt", "other", 0)
+
+
+def test_get_set_roundtrip(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache"))
+    assert cache.get("missing") is None
+    cache.set("k", "value")
+    assert cache.get("k") == "value"
+
+
+def test_expired_entries_are_ignored(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path), ttl=60)
+    cache.set("k", "value")
+    assert cache.get("k") == "value"
+
+    now = time.time()
+    monkeypatch.setattr("time.time", lambda: now + 120)
+    assert cache.get("k") is None
+
+
+class FakeEmbeddings:
+    """Maps known phrases to fixed vectors; counts embedding calls."""
+
+    vectors = {
+        "list files in /tmp": [1.0, 0.0, 0.1],
+        "show files under /tmp": [0.98, 0.0, 0.15],
+        "delete /tmp": [0.0, 1.0, 0.0],
+    }
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return self.vectors[text]
+
+
+def test_semantic_cache_matches_paraphrases():
+    embeddings = FakeEmbeddings()
+    cache = SemanticCache(embeddings, threshold=0.92)
+
+    assert cache.lookup("list files in /tmp") is None
+    cache.add("list files in /tmp", "a.txt b.txt")
+    # The embedding from the miss is reused when adding
+    assert embeddings.calls == 1
+
+    assert cache.lookup("show files under /tmp") == "a.txt b.txt"
+    assert cache.lookup("delete /tmp") is None
+
+
+def test_semantic_cache_discard_drops_pending_embedding():
+    cache = SemanticCache(FakeEmbeddings(), threshold=0.92)
+
+    assert cache.lookup("delete /tmp") is None
+    cache.discard("delete /tmp")
+    assert cache._pending == {}
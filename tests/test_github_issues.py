@@ -1,7 +1,7 @@
 import json
 import pytest
 
-from agenttools.github_issues import send_issue_comment
+from agenttools.github_issues import send_issue_comment, send_issue_comments
 
 
 def test_compose_and_dry_run():
@@ -25,6 +25,7 @@ class DummyResp:
         self.status_code = status_code
         self._json = json_data or {"html_url": "https://github.com/owner/repo/issues/42#issuecomment-1"}
         self.text = text
+        self.content = json.dumps(self._json).encode("utf-8")
 
     def raise_for_status(self):
         if self.status_code >= 400:
@@ -44,7 +45,7 @@ def test_post_comment_success(monkeypatch):
         return DummyResp()
 
     monkeypatch.setenv("GITHUB_TOKEN", "fake-token")
-    monkeypatch.setattr("requests.post", fake_post)
+    monkeypatch.setattr("agenttools.github_issues._SESSION.post", fake_post)
 
     res = send_issue_comment("owner/repo", 42, title="t", body="b", action="a", issue_url="u")
     assert res["url"].startswith("https://github.com/")
@@ -58,7 +59,28 @@ def test_post_comment_http_error(monkeypatch):
         return DummyResp(status_code=500, json_data={"message": "server error"}, text="server error")
 
     monkeypatch.setenv("GITHUB_TOKEN", "fake-token")
-    monkeypatch.setattr("requests.post", fake_post)
+    monkeypatch.setattr("agenttools.github_issues._SESSION.post", fake_post)
 
     with pytest.raises(Exception):
         send_issue_comment("owner/repo", 1, body="b")
+
+
+def test_send_issue_comments_batch(monkeypatch):
+    posted = []
+
+    def fake_post(url, headers=None, data=None, timeout=None):
+        posted.append(url)
+        if "/issues/2/" in url:
+            return DummyResp(status_code=500, json_data={"message": "server error"}, text="server error")
+        return DummyResp()
+
+    monkeypatch.setenv("GITHUB_TOKEN", "fake-token")
+    monkeypatch.setattr("agenttools.github_issues._SESSION.post", fake_post)
+
+    items = [{"repo_full_name": "owner/repo", "issue_number": n, "body": f"note {n}"} for n in (1, 2, 3)]
+    results = send_issue_comments(items)
+
+    assert len(posted) == 3
+    assert results[0]["payload"]["body"].startswith("---\n\nnote 1")
+    assert isinstance(results[1], Exception)
+    assert results[2]["url"].startswith("https://github.com/")
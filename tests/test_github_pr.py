@@ -5,8 +5,10 @@ import pytest
 from agenttools.github_pr import (
     parse_repo_full_name,
     get_git_diff,
+    clear_diff_cache,
     create_pull_request,
 )
+from _fakes import FakePopen
 
 
 def test_parse_repo_full_name_variants():
@@ -21,38 +23,196 @@ def test_get_git_diff_success(monkeypatch, tmp_path):
     git_dir = str(tmp_path)
 
     def fake_run(cmd, check, stdout, stderr):
-        # emulate `git -C <dir> fetch --all`
-        if cmd[:4] == ["git", "-C", git_dir, "fetch"]:
-            return subprocess.CompletedProcess(cmd, 0, stdout=b"", stderr=b"")
+        # emulate `git -C <dir> fetch ...` and `rev-parse`
+        return subprocess.CompletedProcess(cmd, 0, stdout=b"", stderr=b"")
 
+    def fake_popen(cmd, **kwargs):
         # emulate `git -C <dir> diff ...`
-        if cmd[:4] == ["git", "-C", git_dir, "diff"]:
-            return subprocess.CompletedProcess(cmd, 0, stdout=b"sample-diff-content", stderr=b"")
-
-        return subprocess.CompletedProcess(cmd, 0, stdout=b"", stderr=b"")
+        assert cmd[:4] == ["git", "-C", git_dir, "diff"]
+        return FakePopen(cmd, b"sample-diff-content")
 
     monkeypatch.setattr("subprocess.run", fake_run)
+    monkeypatch.setattr("subprocess.Popen", fake_popen)
 
     diff = get_git_diff(git_dir, "main", "feature/1")
     assert "sample-diff-content" in diff
 
 
+def test_get_git_diff_fetches_only_compared_refs(monkeypatch, tmp_path):
+    git_dir = str(tmp_path)
+    calls = []
+
+    def fake_run(cmd, check, stdout, stderr):
+        calls.append(cmd)
+        if cmd[3:5] == ["rev-parse", "--abbrev-ref"]:
+            return subprocess.CompletedProcess(cmd, 0, stdout=b"feature/2\n", stderr=b"")
+        return subprocess.CompletedProcess(cmd, 0, stdout=b"", stderr=b"")
+
+    def fake_popen(cmd, **kwargs):
+        calls.append(cmd)
+        return FakePopen(cmd, b"diff")
+
+    monkeypatch.setattr("subprocess.run", fake_run)
+    monkeypatch.setattr("subprocess.Popen", fake_popen)
+
+    get_git_diff(git_dir, "main", shallow=True)
+    fetches = [c for c in calls if c[3] == "fetch"]
+    assert fetches == [["git", "-C", git_dir, "fetch", "--no-tags", "--prune", "--depth=1", "origin", "main", "feature/2"]]
+    assert calls[-1][-1] == "origin/main..origin/feature/2"
+
+
+def test_get_git_diff_head_missing_on_remote(monkeypatch, tmp_path):
+    git_dir = str(tmp_path)
+    calls = []
+
+    def fake_run(cmd, check, stdout, stderr):
+        calls.append(cmd)
+        if cmd[3] == "fetch" and cmd[-1] == "feature/new":
+            raise subprocess.CalledProcessError(128, cmd, stderr=b"fatal: couldn't find remote ref feature/new\n")
+        return subprocess.CompletedProcess(cmd, 0, stdout=b"", stderr=b"")
+
+    def fake_popen(cmd, **kwargs):
+        calls.append(cmd)
+        return FakePopen(cmd, b"local-diff")
+
+    monkeypatch.setattr("subprocess.run", fake_run)
+    monkeypatch.setattr("subprocess.Popen", fake_popen)
+
+    assert get_git_diff(git_dir, "main", "feature/new") == "local-diff"
+    fetches = [c[-2:] for c in calls if c[3] == "fetch"]
+    assert fetches == [["main", "feature/new"], ["origin", "main"]]
+    # the unpushed head is compared from the local branch
+    assert calls[-1][-1] == "origin/main..feature/new"
+
+
+def test_get_git_diff_fetch_failure_raises(monkeypatch, tmp_path):
+    def fake_run(cmd, check, stdout, stderr):
+        raise subprocess.CalledProcessError(128, cmd, stderr=b"fatal: couldn't find remote ref main\n")
+
+    monkeypatch.setattr("subprocess.run", fake_run)
+
+    with pytest.raises(RuntimeError, match="git fetch failed"):
+        get_git_diff(str(tmp_path), "main", "feature/1")
+
+
+def test_get_git_diff_memoized_per_commit_pair(monkeypatch, tmp_path):
+    git_dir = str(tmp_path)
+    shas = {"head": b"bbb"}
+    diffs = []
+
+    def fake_run(cmd, check, stdout, stderr):
+        if cmd[3] == "rev-parse":
+            return subprocess.CompletedProcess(cmd, 0, stdout=b"aaa\n" + shas["head"] + b"\n", stderr=b"")
+        return subprocess.CompletedProcess(cmd, 0, stdout=b"", stderr=b"")
+
+    def fake_popen(cmd, **kwargs):
+        diffs.append(cmd)
+        return FakePopen(cmd, b"diff-" + shas["head"])
+
+    monkeypatch.setattr("subprocess.run", fake_run)
+    monkeypatch.setattr("subprocess.Popen", fake_popen)
+    clear_diff_cache()
+
+    assert get_git_diff(git_dir, "main", "feature/1") == "diff-bbb"
+    assert get_git_diff(git_dir, "main", "feature/1") == "diff-bbb"
+    assert len(diffs) == 1
+
+    # A moved head ref is a different key
+    shas["head"] = b"ccc"
+    assert get_git_diff(git_dir, "main", "feature/1") == "diff-ccc"
+    assert len(diffs) == 2
+
+    clear_diff_cache()
+    get_git_diff(git_dir, "main", "feature/1")
+    assert len(diffs) == 3
+
+
 def test_get_git_diff_truncation(monkeypatch, tmp_path):
     git_dir = str(tmp_path)
 
     big = b"A" * 300_000
+    procs = []
 
     def fake_run(cmd, check, stdout, stderr):
-        if cmd[:4] == ["git", "-C", git_dir, "fetch"]:
-            return subprocess.CompletedProcess(cmd, 0, stdout=b"", stderr=b"")
-        if cmd[:4] == ["git", "-C", git_dir, "diff"]:
-            return subprocess.CompletedProcess(cmd, 0, stdout=big, stderr=b"")
         return subprocess.CompletedProcess(cmd, 0, stdout=b"", stderr=b"")
 
+    def fake_popen(cmd, **kwargs):
+        procs.append(FakePopen(cmd, big))
+        return procs[-1]
+
     monkeypatch.setattr("subprocess.run", fake_run)
+    monkeypatch.setattr("subprocess.Popen", fake_popen)
 
     diff = get_git_diff(git_dir, "main", "feature/large", max_bytes=100_000)
     assert "Diff truncated" in diff
+    assert diff.startswith("A" * 100_000) and "A" * 100_001 not in diff
+    # the rest of the output is never read; git is stopped instead
+    assert procs[0].killed
+
+
+def test_get_git_diff_truncation_drops_split_character(monkeypatch, tmp_path):
+    monkeypatch.setattr("subprocess.run", lambda cmd, check, stdout, stderr: subprocess.CompletedProcess(cmd, 0, stdout=b"", stderr=b""))
+    monkeypatch.setattr("subprocess.Popen", lambda cmd, **kwargs: FakePopen(cmd, "é".encode("utf-8") * 10))
+
+    # the limit falls inside the sixth two-byte character
+    diff = get_git_diff(str(tmp_path), "main", "feature/utf8", max_bytes=11)
+    assert diff == "é" * 5 + "\n\n[Diff truncated: output exceeds 11 bytes]\n"
+
+
+def test_get_git_diff_uses_pygit2_when_available(monkeypatch, tmp_path):
+    import types
+
+    git_dir = str(tmp_path)
+    patches = [b"diff --git a/x b/x\n" + b"+" * 60, b"diff --git a/y b/y\n" + b"+" * 60, b"never read"]
+    read = []
+
+    class FakeObject:
+        def __init__(self, sha):
+            self.sha = sha
+
+        def peel(self, kind):
+            return self.sha
+
+    class FakeDiff:
+        def find_similar(self):
+            pass
+
+        def __iter__(self):
+            for data in patches:
+                read.append(data)
+                yield types.SimpleNamespace(data=data)
+
+    class FakeRepository:
+        def __init__(self, path):
+            assert path == git_dir
+
+        def __getitem__(self, sha):
+            return FakeObject(sha)
+
+        def diff(self, a, b, context_lines):
+            assert (a, b) == ("aaa", "bbb")
+            return FakeDiff()
+
+    fake_pygit2 = types.SimpleNamespace(Repository=FakeRepository, Commit=object, GitError=Exception)
+
+    def fake_run(cmd, check, stdout, stderr):
+        if cmd[3] == "rev-parse":
+            return subprocess.CompletedProcess(cmd, 0, stdout=b"aaa\nbbb\n", stderr=b"")
+        return subprocess.CompletedProcess(cmd, 0, stdout=b"", stderr=b"")
+
+    def fake_popen(cmd, **kwargs):
+        raise AssertionError("git diff should not be spawned")
+
+    monkeypatch.setattr("agenttools.github_pr.pygit2", fake_pygit2)
+    monkeypatch.setattr("subprocess.run", fake_run)
+    monkeypatch.setattr("subprocess.Popen", fake_popen)
+    clear_diff_cache()
+
+    diff = get_git_diff(git_dir, "main", "feature/1", max_bytes=100)
+    assert diff.startswith("diff --git a/x b/x")
+    assert "Diff truncated" in diff
+    # patches past the limit are never generated
+    assert len(read) == 2
 
 
 class DummyResp:
@@ -72,28 +232,29 @@ class DummyResp:
 def test_create_pull_request_success(monkeypatch):
     called = {}
 
-    def fake_post(url, headers=None, data=None, timeout=None):
+    def fake_post(url, headers=None, json=None, timeout=None):
         called['url'] = url
         called['headers'] = headers
-        called['data'] = data
+        called['json'] = json
         return DummyResp()
 
     monkeypatch.setenv("GITHUB_TOKEN", "fake-token")
-    monkeypatch.setattr("requests.post", fake_post)
+    monkeypatch.setattr("agenttools.github_pr._SESSION.post", fake_post)
 
     res = create_pull_request("owner/repo", head="issue_1", base="main", title="T", body="B")
     assert res["url"].startswith("https://github.com/")
     assert 'owner/repo/pulls' in called['url']
-    payload = json.loads(called['data'])
+    payload = called['json']
     assert payload["head"] == "issue_1"
+    assert res["response"] is not None
 
 
 def test_create_pull_request_http_error(monkeypatch):
-    def fake_post(url, headers=None, data=None, timeout=None):
+    def fake_post(url, headers=None, json=None, timeout=None):
         return DummyResp(status_code=500, json_data={"message": "server error"}, text="server error")
 
     monkeypatch.setenv("GITHUB_TOKEN", "fake-token")
-    monkeypatch.setattr("requests.post", fake_post)
+    monkeypatch.setattr("agenttools.github_pr._SESSION.post", fake_post)
 
     import requests as _requests
 
@@ -111,3 +272,15 @@ def test_create_pr_from_git_no_changes(monkeypatch, tmp_path):
     )
     assert isinstance(res, str)
     assert "No changes" in res
+
+
+def test_session_retries_only_reads_and_ref_updates():
+    from agenttools.github_pr import _SESSION
+
+    retry = _SESSION.get_adapter("https://api.github.com/repos/owner/repo").max_retries
+    assert retry.respect_retry_after_header
+    assert 502 in retry.status_forcelist
+    # reads and ref updates may be retried; requests that create objects or
+    # commits (Contents API PUT/DELETE) must not run twice
+    assert {"GET", "PATCH"} <= retry.allowed_methods
+    assert not {"POST", "PUT", "DELETE"} & retry.allowed_methods
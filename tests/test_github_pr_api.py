@@ -1,11 +1,13 @@
 import os
 import json
+import hashlib
 import subprocess
 from pathlib import Path
 
 import pytest
 
 from agenttools.github_pr import push_branch_via_api, push_tree_via_api
+from _fakes import FakePopen
 
 
 class DummyResp:
@@ -13,7 +15,7 @@ class DummyResp:
         self.status_code = status_code
         self._json = json_data or {}
         self.text = text
-        self.content = content
+        self.content = content or json.dumps(self._json).encode("utf-8")
 
     def raise_for_status(self):
         if self.status_code >= 400:
@@ -23,19 +25,29 @@ class DummyResp:
         return self._json
 
 
+def _body(json_arg, data):
+    """Return the payload of a fake request sent with either json= or data=."""
+    return json_arg if json_arg is not None else json.loads(data)
+
+
 def test_push_branch_via_api_name_status(monkeypatch, tmp_path):
     # prepare local files
     git_dir = str(tmp_path)
     (tmp_path / "new.txt").write_text("new content")
     (tmp_path / "existing.txt").write_text("updated content")
 
-    # fake subprocess.run for git diff --name-status
+    # fake subprocess.Popen for git diff --name-status
+    def fake_popen(cmd, **kwargs):
+        assert cmd[:4] == ["git", "-C", git_dir, "diff"]
+        return FakePopen(cmd, b"A\0new.txt\0M\0existing.txt\0D\0old.txt\0")
+
+    # the branch commit is available locally: blob SHAs come from ls-tree
     def fake_run(cmd, check, stdout, stderr):
-        if cmd[:4] == ["git", "-C", git_dir, "diff"]:
-            out = b"A\tnew.txt\nM\texisting.txt\nD\told.txt\n"
-            return subprocess.CompletedProcess(cmd, 0, stdout=out, stderr=b"")
-        return subprocess.CompletedProcess(cmd, 0, stdout=b"", stderr=b"")
+        assert cmd[3:] == ["ls-tree", "-r", "-z", "basecommitsha"]
+        out = b"100644 blob existingsha\texisting.txt\x00100644 blob oldsha\told.txt\x00040000 tree treesha\tdir\x00"
+        return subprocess.CompletedProcess(cmd, 0, stdout=out, stderr=b"")
 
+    monkeypatch.setattr("subprocess.Popen", fake_popen)
     monkeypatch.setattr("subprocess.run", fake_run)
 
     calls = {"gets": [], "puts": [], "deletes": [], "posts": []}
@@ -68,10 +80,10 @@ def test_push_branch_via_api_name_status(monkeypatch, tmp_path):
         return DummyResp(201, json_data={})
 
     monkeypatch.setenv("GITHUB_TOKEN", "fake-token")
-    monkeypatch.setattr("requests.get", fake_get)
-    monkeypatch.setattr("requests.put", fake_put)
-    monkeypatch.setattr("requests.delete", fake_delete)
-    monkeypatch.setattr("requests.post", fake_post)
+    monkeypatch.setattr("agenttools.github_pr._SESSION.get", fake_get)
+    monkeypatch.setattr("agenttools.github_pr._SESSION.put", fake_put)
+    monkeypatch.setattr("agenttools.github_pr._SESSION.delete", fake_delete)
+    monkeypatch.setattr("agenttools.github_pr._SESSION.post", fake_post)
 
     res = push_branch_via_api(git_dir, "owner/repo", base="main", head="issue_1", token="fake-token")
     assert "branch_url" in res
@@ -80,6 +92,80 @@ def test_push_branch_via_api_name_status(monkeypatch, tmp_path):
     op_types = [o.get("op") for o in ops]
     assert "add_or_update" in op_types
     assert "delete" in op_types
+    assert not any("/contents/" in url for url, _ in calls["gets"])
+    assert [p.get("sha") for _, p in calls["puts"]] == [None, "existingsha"]
+    assert [p["sha"] for _, p in calls["deletes"]] == ["oldsha"]
+
+
+def test_push_branch_via_api_nul_separated_renames(monkeypatch, tmp_path):
+    git_dir = str(tmp_path)
+    (tmp_path / "new\tname.txt").write_text("renamed")
+    (tmp_path / "copy.txt").write_text("copied")
+
+    def fake_popen(cmd, **kwargs):
+        assert "-z" in cmd
+        return FakePopen(cmd, b"R100\0old\nname.txt\0new\tname.txt\0C075\0src.txt\0copy.txt\0")
+
+    monkeypatch.setattr("subprocess.Popen", fake_popen)
+    # branch commit not in the local object database -> API lookups
+    monkeypatch.setattr("subprocess.run", lambda cmd, **kw: subprocess.CompletedProcess(cmd, 128, stdout=b"", stderr=b"bad object"))
+
+    def fake_get(url, headers=None, params=None, timeout=None):
+        if "/git/ref/heads/" in url or url.endswith("/contents/old\nname.txt"):
+            return DummyResp(200, json_data={"object": {"sha": "basecommitsha"}, "sha": "oldsha"})
+        return DummyResp(404)
+
+    monkeypatch.setattr("agenttools.github_pr._SESSION.get", fake_get)
+    monkeypatch.setattr("agenttools.github_pr._SESSION.put", lambda url, **kw: DummyResp(201))
+    monkeypatch.setattr("agenttools.github_pr._SESSION.delete", lambda url, **kw: DummyResp(200))
+
+    res = push_branch_via_api(git_dir, "owner/repo", base="main", head="issue_1", token="fake-token")
+    assert [(o["op"], o["path"]) for o in res["operations"]] == [
+        ("delete", "old\nname.txt"),
+        ("add_or_update", "new\tname.txt"),
+        ("add_or_update", "copy.txt"),
+    ]
+
+
+def test_push_branch_via_api_parallel_sha_lookups(monkeypatch, tmp_path):
+    import threading
+    import time
+
+    git_dir = str(tmp_path)
+    names = [f"f{i}.txt" for i in range(6)]
+    for name in names:
+        (tmp_path / name).write_text(name)
+
+    def fake_popen(cmd, **kwargs):
+        return FakePopen(cmd, b"".join(b"M\0" + n.encode() + b"\0" for n in names) + b"D\0old.txt\0")
+
+    monkeypatch.setattr("subprocess.Popen", fake_popen)
+    # branch commit not in the local object database -> API lookups
+    monkeypatch.setattr("subprocess.run", lambda cmd, **kw: subprocess.CompletedProcess(cmd, 128, stdout=b"", stderr=b"bad object"))
+
+    lock = threading.Lock()
+    state = {"in_flight": 0, "max": 0}
+
+    def fake_get(url, headers=None, params=None, timeout=None):
+        if "/git/ref/heads/" in url:
+            return DummyResp(200, json_data={"object": {"sha": "basecommitsha"}})
+        with lock:
+            state["in_flight"] += 1
+            state["max"] = max(state["max"], state["in_flight"])
+        time.sleep(0.01)
+        with lock:
+            state["in_flight"] -= 1
+        return DummyResp(200, json_data={"sha": url.rsplit("/", 1)[-1] + "-sha"})
+
+    puts, deletes = [], []
+    monkeypatch.setattr("agenttools.github_pr._SESSION.get", fake_get)
+    monkeypatch.setattr("agenttools.github_pr._SESSION.put", lambda url, **kw: puts.append(kw["json"]) or DummyResp(200))
+    monkeypatch.setattr("agenttools.github_pr._SESSION.delete", lambda url, **kw: deletes.append(kw["json"]) or DummyResp(200))
+
+    push_branch_via_api(git_dir, "owner/repo", base="main", head="issue_1", token="fake-token")
+    assert state["max"] > 1
+    assert [p["sha"] for p in puts] == [f"{n}-sha" for n in names]
+    assert [d["sha"] for d in deletes] == ["old.txt-sha"]
 
 
 def test_push_tree_via_api_dry_run(monkeypatch, tmp_path):
@@ -94,18 +180,25 @@ def test_push_tree_via_api_dry_run(monkeypatch, tmp_path):
     base_commit_sha = "basecommit"
     base_tree_sha = "basetree"
 
+    gets = []
+
     def fake_get(url, headers=None, params=None, timeout=None):
-        if url.endswith("/git/ref/heads/main"):
-            return DummyResp(200, json_data={"object": {"sha": base_commit_sha}})
-        if "/git/commits/" in url:
-            return DummyResp(200, json_data={"tree": {"sha": base_tree_sha}})
+        gets.append(url)
         if "/git/trees/" in url:
             # remote has only c.txt
             return DummyResp(200, json_data={"tree": [{"path": "c.txt", "type": "blob", "sha": "csha"}]})
         return DummyResp(404, json_data={})
 
+    def fake_post(url, headers=None, json=None, timeout=None):
+        # refs and base tree are resolved with a single GraphQL query
+        assert url.endswith("/graphql")
+        assert json["variables"]["base"] == "refs/heads/main"
+        repository = {"base": {"target": {"oid": base_commit_sha, "tree": {"oid": base_tree_sha}}}, "head": None}
+        return DummyResp(200, json_data={"data": {"repository": repository}})
+
     monkeypatch.setenv("GITHUB_TOKEN", "fake-token")
-    monkeypatch.setattr("requests.get", fake_get)
+    monkeypatch.setattr("agenttools.github_pr._SESSION.get", fake_get)
+    monkeypatch.setattr("agenttools.github_pr._SESSION.post", fake_post)
 
     res = push_tree_via_api(git_dir, "owner/repo", base="main", head="newbranch", token="fake-token", dry_run=True)
     assert "branch_url" in res
@@ -113,4 +206,189 @@ def test_push_tree_via_api_dry_run(monkeypatch, tmp_path):
     # In dry-run we should see planned add_or_update for a.txt and sub/b.txt and delete for c.txt
     op_summary = {o.get("op"): o for o in ops}
     assert any(o.get("op") == "add_or_update" for o in ops)
-    assert any(o.get("op") == "delete" for o in ops)
\ No newline at end of file
+    assert any(o.get("op") == "delete" for o in ops)
+    assert {"op": "create_ref", "ref": "newbranch", "from": base_commit_sha} in ops
+    assert gets == [f"https://api.github.com/repos/owner/repo/git/trees/{base_tree_sha}"]
+
+
+def test_push_tree_via_api_single_commit(monkeypatch, tmp_path):
+    git_dir = str(tmp_path)
+    (tmp_path / "a.txt").write_text("A")
+    (tmp_path / "img.bin").write_bytes(b"\xff\xd8")
+    # same content as the remote blob -> unchanged
+    (tmp_path / "same.txt").write_text("same")
+    same_sha = hashlib.sha1(b"blob 4\0same").hexdigest()
+
+    def fake_get(url, headers=None, params=None, timeout=None):
+        if url.endswith("/git/ref/heads/main"):
+            return DummyResp(200, json_data={"object": {"sha": "basecommit"}})
+        if url.endswith("/git/ref/heads/feature"):
+            return DummyResp(200, json_data={"object": {"sha": "headcommit"}})
+        if "/git/commits/" in url:
+            return DummyResp(200, json_data={"tree": {"sha": "basetree"}})
+        if "/git/trees/" in url:
+            return DummyResp(200, json_data={"tree": [
+                {"path": "same.txt", "type": "blob", "sha": same_sha, "mode": "100644"},
+                {"path": "run.sh", "type": "blob", "sha": "runsha", "mode": "100755"},
+            ]})
+        return DummyResp(404, json_data={})
+
+    posts, patches = [], []
+
+    def fake_post(url, headers=None, json=None, data=None, timeout=None):
+        if url.endswith("/graphql"):
+            # GraphQL unavailable -> REST fallback
+            return DummyResp(502)
+        payload = _body(json, data)
+        posts.append((url, payload))
+        if url.endswith("/git/blobs"):
+            return DummyResp(201, json_data={"sha": "blob-" + payload["encoding"]})
+        if url.endswith("/git/trees"):
+            return DummyResp(201, json_data={"sha": "newtree"})
+        if url.endswith("/git/commits"):
+            return DummyResp(201, json_data={"sha": "newcommit"})
+        return DummyResp(404)
+
+    def fake_patch(url, headers=None, json=None, data=None, timeout=None):
+        payload = _body(json, data)
+        patches.append((url, payload))
+        return DummyResp(200, json_data={"object": {"sha": payload["sha"]}})
+
+    monkeypatch.setattr("agenttools.github_pr._SESSION.get", fake_get)
+    monkeypatch.setattr("agenttools.github_pr._SESSION.post", fake_post)
+    monkeypatch.setattr("agenttools.github_pr._SESSION.patch", fake_patch)
+
+    res = push_tree_via_api(git_dir, "owner/repo", base="main", head="feature", token="fake-token")
+
+    assert [url.rsplit("/git/", 1)[1] for url, _ in posts] == ["blobs", "blobs", "trees", "commits"]
+    # text is uploaded as utf-8, binary content as base64
+    assert sorted((p["encoding"], p["content"]) for _, p in posts[:2]) == [("base64", "/9g="), ("utf-8", "A")]
+    tree_payload = posts[2][1]
+    assert tree_payload["base_tree"] == "basetree"
+    assert tree_payload["tree"] == [
+        {"path": "a.txt", "mode": "100644", "type": "blob", "sha": "blob-utf-8"},
+        {"path": "img.bin", "mode": "100644", "type": "blob", "sha": "blob-base64"},
+        {"path": "run.sh", "mode": "100755", "type": "blob", "sha": None},
+    ]
+    assert posts[3][1]["parents"] == ["headcommit"]
+    assert patches == [(
+        "https://api.github.com/repos/owner/repo/git/refs/heads/feature", {"sha": "newcommit"}
+    )]
+    assert [o["op"] for o in res["operations"]] == ["add_or_update", "add_or_update", "delete", "commit", "update_ref"]
+
+
+def test_push_tree_via_api_bounded_blob_uploads(monkeypatch, tmp_path):
+    import threading
+    import time
+    from agenttools import github_pr
+
+    for i in range(20):
+        (tmp_path / f"f{i}.txt").write_text(str(i))
+
+    def fake_get(url, headers=None, params=None, timeout=None):
+        if url.endswith("/git/ref/heads/main"):
+            return DummyResp(200, json_data={"object": {"sha": "basecommit"}})
+        if "/git/commits/" in url:
+            return DummyResp(200, json_data={"tree": {"sha": "basetree"}})
+        if "/git/trees/" in url:
+            return DummyResp(200, json_data={"tree": []})
+        return DummyResp(404, json_data={})
+
+    lock = threading.Lock()
+    state = {"in_flight": 0, "max": 0}
+
+    def fake_post(url, headers=None, json=None, data=None, timeout=None):
+        if url.endswith("/git/blobs"):
+            with lock:
+                state["in_flight"] += 1
+                state["max"] = max(state["max"], state["in_flight"])
+            time.sleep(0.01)
+            with lock:
+                state["in_flight"] -= 1
+        return DummyResp(201, json_data={"sha": "x"})
+
+    monkeypatch.setattr("agenttools.github_pr._SESSION.get", fake_get)
+    monkeypatch.setattr("agenttools.github_pr._SESSION.post", fake_post)
+
+    res = push_tree_via_api(str(tmp_path), "owner/repo", base="main", head="feature", token="fake-token")
+    assert sum(o["op"] == "add_or_update" for o in res["operations"]) == 20
+    assert 1 < state["max"] <= github_pr.MAX_CONCURRENT_REQUESTS
+
+
+def test_push_tree_via_api_uploads_each_blob_once(monkeypatch, tmp_path):
+    (tmp_path / "a.txt").write_text("dup")
+    (tmp_path / "b.txt").write_text("dup")
+    # moved file: its content is already a blob of the base tree
+    (tmp_path / "moved.txt").write_text("kept")
+    kept_sha = hashlib.sha1(b"blob 4\0kept").hexdigest()
+
+    def fake_get(url, headers=None, params=None, timeout=None):
+        if url.endswith("/git/ref/heads/main"):
+            return DummyResp(200, json_data={"object": {"sha": "basecommit"}})
+        if "/git/commits/" in url:
+            return DummyResp(200, json_data={"tree": {"sha": "basetree"}})
+        if "/git/trees/" in url:
+            return DummyResp(200, json_data={"tree": [{"path": "old.txt", "type": "blob", "sha": kept_sha, "mode": "100644"}]})
+        return DummyResp(404, json_data={})
+
+    posts = []
+
+    def fake_post(url, headers=None, json=None, data=None, timeout=None):
+        posts.append((url, _body(json, data)))
+        return DummyResp(201, json_data={"sha": "dupsha" if url.endswith("/git/blobs") else "x"})
+
+    monkeypatch.setattr("agenttools.github_pr._SESSION.get", fake_get)
+    monkeypatch.setattr("agenttools.github_pr._SESSION.post", fake_post)
+
+    push_tree_via_api(str(tmp_path), "owner/repo", base="main", head="feature", token="fake-token")
+
+    assert [p["content"] for url, p in posts if url.endswith("/git/blobs")] == ["dup"]
+    tree = next(p["tree"] for url, p in posts if url.endswith("/git/trees"))
+    assert {e["path"]: e["sha"] for e in tree} == {"a.txt": "dupsha", "b.txt": "dupsha", "moved.txt": kept_sha, "old.txt": None}
+
+
+def test_push_tree_via_api_modes_from_local_files(monkeypatch, tmp_path):
+    (tmp_path / "a.txt").write_text("A")
+    (tmp_path / "link").symlink_to("a.txt")
+    # executable bit added locally; content unchanged
+    (tmp_path / "tool.sh").write_text("run")
+    os.chmod(tmp_path / "tool.sh", 0o755)
+    tool_sha = hashlib.sha1(b"blob 3\x00run").hexdigest()
+    # executable on the remote, a regular file locally
+    (tmp_path / "plain.sh").write_text("new")
+
+    def fake_get(url, headers=None, params=None, timeout=None):
+        if url.endswith("/git/ref/heads/main"):
+            return DummyResp(200, json_data={"object": {"sha": "basecommit"}})
+        if "/git/commits/" in url:
+            return DummyResp(200, json_data={"tree": {"sha": "basetree"}})
+        if "/git/trees/" in url:
+            return DummyResp(200, json_data={"tree": [
+                {"path": "tool.sh", "type": "blob", "sha": tool_sha, "mode": "100644"},
+                {"path": "plain.sh", "type": "blob", "sha": "oldsha", "mode": "100755"},
+            ]})
+        return DummyResp(404, json_data={})
+
+    posts = []
+
+    def fake_post(url, headers=None, json=None, data=None, timeout=None):
+        payload = _body(json, data)
+        posts.append((url, payload))
+        if url.endswith("/git/blobs"):
+            return DummyResp(201, json_data={"sha": "blob-" + payload["content"]})
+        return DummyResp(201, json_data={"sha": "x"})
+
+    monkeypatch.setattr("agenttools.github_pr._SESSION.get", fake_get)
+    monkeypatch.setattr("agenttools.github_pr._SESSION.post", fake_post)
+
+    push_tree_via_api(str(tmp_path), "owner/repo", base="main", head="feature", token="fake-token")
+
+    # the link is uploaded as its target, not the content it points to
+    assert sorted(p["content"] for url, p in posts if url.endswith("/git/blobs")) == ["A", "a.txt", "new"]
+    tree = next(p["tree"] for url, p in posts if url.endswith("/git/trees"))
+    assert {e["path"]: (e["mode"], e["sha"]) for e in tree} == {
+        "a.txt": ("100644", "blob-A"),
+        "link": ("120000", "blob-a.txt"),
+        "plain.sh": ("100644", "blob-new"),
+        "tool.sh": ("100755", tool_sha),
+    }
@@ -0,0 +1,47 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+_SCRIPT = Path(__file__).resolve().parent.parent / "scripts" / "github_pr.py"
+
+
+@pytest.fixture(scope="module")
+def script():
+    spec = importlib.util.spec_from_file_location("github_pr_script", _SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.mark.parametrize("repeat", [1, 20_000])
+def test_read_body_file_normalizes_newlines(script, tmp_path, repeat):
+    body = tmp_path / "body.md"
+    body.write_bytes("Fix – bug\r\nline two\rline three\n".encode("utf-8") * repeat)
+    # both the small-file read and the memory-mapped path are exercised
+    assert (body.stat().st_size >= script._MMAP_MIN_SIZE) == (repeat > 1)
+
+    assert script.read_body_file(str(body)) == "Fix – bug\nline two\nline three\n" * repeat
+
+
+def test_main_summarizes_api_push_operations(script, monkeypatch):
+    ops = [
+        {"op": "add_or_update", "path": "a.txt", "sha": "blob1"},
+        {"op": "delete", "path": "old.txt"},
+        {"op": "commit", "sha": "newcommit"},
+        {"op": "update_ref", "ref": "feature", "response": {}},
+    ]
+    monkeypatch.setattr(script, "push_tree_via_api", lambda *a, **kw: {"branch_url": "url", "operations": ops})
+    bodies = []
+
+    def fake_create_pull_request(repo, head, base=None, title=None, body=None, token=None, dry_run=False):
+        bodies.append(body)
+        return {"payload": {}, "branch_url": "url"}
+
+    monkeypatch.setattr(script, "create_pull_request", fake_create_pull_request)
+
+    assert script.main(["--git-dir", ".", "--repo", "owner/repo", "--head", "feature", "--token", "t", "--dry-run"]) == 0
+    assert bodies == [
+        "Automated PR (API push)\n\nChanges:\n"
+        "add_or_update: a.txt\ndelete: old.txt\ncommit: newcommit\nupdate_ref: feature"
+    ]
@@ -24,3 +24,29 @@ def test_read_file_error(tmp_path):
     # non-existent file
     res = read_file.invoke({"file_path": str(tmp_path / "nope.txt")})
     assert "Error" in res
+
+
+def test_list_directory_entries(tmp_path):
+    from agenttools.tools import list_directory
+
+    assert "is empty" in list_directory.invoke({"directory_path": str(tmp_path)})
+
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "b.txt").write_text("12345")
+    (tmp_path / "a.txt").write_text("")
+    res = list_directory.invoke({"directory_path": str(tmp_path)})
+    assert res == (
+        f"Contents of {tmp_path}:\n"
+        "\nDirectories:\n[DIR]  sub"
+        "\n\nFiles:\n[FILE] a.txt (0 bytes)\n[FILE] b.txt (5 bytes)"
+    )
+    assert "not found" in list_directory.invoke({"directory_path": str(tmp_path / "missing")})
+
+
+def test_file_exists_kinds(tmp_path):
+    from agenttools.tools import file_exists
+
+    (tmp_path / "f.txt").write_text("abc")
+    assert file_exists.invoke({"file_path": str(tmp_path / "f.txt")}) == f"File exists at {tmp_path / 'f.txt'} (3 bytes)"
+    assert file_exists.invoke({"file_path": str(tmp_path)}) == f"Directory exists at {tmp_path}"
+    assert file_exists.invoke({"file_path": str(tmp_path / "nope")}).startswith("Path does not exist")
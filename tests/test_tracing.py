@@ -0,0 +1,65 @@
+import agenttools.tracing as tracing
+
+
+def test_trace_print_reuses_log_handle(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(tracing, "_LOG_DIR", None)
+    monkeypatch.setattr(tracing, "AGENT_LOG_FILE", "trace.log")
+    tracing.set_log_dir(str(tmp_path))
+
+    tracing.trace_print("first")
+    fh = tracing._LOG_FH
+    tracing.trace_print("second", log_only=True)
+    assert tracing._LOG_FH is fh
+
+    # Lines are visible in the file without closing the handle
+    lines = (tmp_path / "trace.log").read_text(encoding="utf-8").splitlines()
+    assert [line.split("] ", 1)[1] for line in lines] == ["first", "second"]
+    assert capsys.readouterr().out == "first\n"
+
+    tracing._close_log()
+    assert fh.closed
+
+
+def test_log_path_pinned_at_first_use(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "_LOG_DIR", None)
+    monkeypatch.setattr(tracing, "AGENT_LOG_FILE", "trace.log")
+    first, other = tmp_path / "first", tmp_path / "other"
+    first.mkdir()
+    other.mkdir()
+
+    monkeypatch.chdir(first)
+    tracing.trace_print("one", log_only=True)
+    monkeypatch.chdir(other)
+    tracing.trace_print("two", log_only=True)
+    tracing._close_log()
+
+    assert len((first / "trace.log").read_text(encoding="utf-8").splitlines()) == 2
+    assert not (other / "trace.log").exists()
+
+
+def test_log_response_caps_large_dicts(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "_LOG_DIR", str(tmp_path))
+    monkeypatch.setattr(tracing, "AGENT_LOG_FILE", "trace.log")
+
+    tracing.log_response({"messages": ["x" * 100_000], "obj": object()})
+    tracing._close_log()
+
+    text = (tmp_path / "trace.log").read_text(encoding="utf-8")
+    assert "Result is dict with keys: ['messages', 'obj']" in text
+    assert text.rstrip().endswith("...<truncated>")
+    assert len(text) < 20_000
+
+
+def test_log_response_writes_one_entry(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "_LOG_DIR", str(tmp_path))
+    monkeypatch.setattr(tracing, "AGENT_LOG_FILE", "trace.log")
+
+    tracing.log_response({"a": 1})
+    tracing.log_response(["b"])
+    tracing._close_log()
+
+    text = (tmp_path / "trace.log").read_text(encoding="utf-8")
+    # one timestamped entry per call
+    assert text.count("Z] ") == 2
+    assert "Result (json):\n{\n  \"a\": 1\n}" in text
+    assert "Result type: <class 'list'>\n['b']" in text